@@ -0,0 +1,174 @@
+"""
+Compares the default stack (stdlib json, asyncio loop) with the ACCELERATE=true
+stack (orjson, uvloop) on the bot's redemption and profile hot paths.
+
+Usage:
+python benchmark.py [--iterations N] [--requests N]
+
+Accelerated rows are skipped when orjson/uvloop are not installed.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from datetime import datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+SECRET = "tB87#kPtkxqOS2"
+
+# Representative API responses
+PLAYER_INFO_RESPONSE = json.dumps({
+    "code": 0,
+    "data": {
+        "fid": 123456789,
+        "nickname": "[SBZ] Ｐｌａｙｅｒ名前",
+        "kid": 1454,
+        "stove_lv": 42,
+        "stove_lv_content": "https://gof-formal-avatar.akamaized.net/img/icons/stove_lv_42.png",
+        "avatar_image": "https://gof-formal-avatar.akamaized.net/avatar-dev/2023/07/17/1001.png",
+    },
+    "msg": "success",
+    "err_code": "",
+}, ensure_ascii=False).encode()
+GIFTCODE_RESPONSE = json.dumps({"code": 1, "data": [], "msg": "RECEIVED.", "err_code": 40008}).encode()
+
+
+def encode_data(data):
+    """Mirrors encode_data in main.py."""
+    sorted_keys = sorted(data.keys())
+    encoded_data = "&".join(
+        [
+            f"{key}={json.dumps(data[key]) if isinstance(data[key], dict) else data[key]}"
+            for key in sorted_keys
+        ]
+    )
+    sign = hashlib.md5(f"{encoded_data}{SECRET}".encode()).hexdigest()
+    return {"sign": sign, **data}
+
+
+def bench_redemption(loads, iterations):
+    """One player's redemption: sign and decode the login, then sign and decode the gift code call."""
+    started = time.perf_counter()
+    for i in range(iterations):
+        now = f"{int(datetime.now().timestamp())}"
+        encode_data({"fid": f"{i}", "time": now})
+        loads(PLAYER_INFO_RESPONSE)
+        encode_data({"fid": f"{i}", "cdk": "CODE2024", "time": now})
+        loads(GIFTCODE_RESPONSE)
+    return time.perf_counter() - started
+
+
+def bench_profile_decode(loads, iterations):
+    """Decoding the player info response used by /user, /profile and /link."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        loads(PLAYER_INFO_RESPONSE)["data"].get("stove_lv", 0)
+    return time.perf_counter() - started
+
+
+async def profile_roundtrips(loads, requests):
+    """Local HTTP round trips returning the player info payload, decoded on the client side."""
+    response = (
+        b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+        + f"content-length: {len(PLAYER_INFO_RESPONSE)}\r\n\r\n".encode()
+        + PLAYER_INFO_RESPONSE
+    )
+
+    body = "&".join(f"{key}={value}" for key, value in encode_data({"fid": "123456789", "time": "0"}).items()).encode()
+    request = (
+        b"POST /api/player HTTP/1.1\r\nhost: localhost\r\ncontent-type: application/x-www-form-urlencoded\r\n"
+        + f"content-length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+
+    handlers = []
+
+    async def handle(reader, writer):
+        handlers.append(asyncio.current_task())
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                await reader.readexactly(len(body))
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    started = time.perf_counter()
+    for _ in range(requests):
+        writer.write(request)
+        await writer.drain()
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = int(headers.split(b"content-length: ")[1].split(b"\r\n")[0])
+        loads(await reader.readexactly(length))
+    elapsed = time.perf_counter() - started
+    writer.close()
+    await writer.wait_closed()
+    await asyncio.gather(*handlers)
+    server.close()
+    await server.wait_closed()
+    return elapsed
+
+
+def run_loop(coro_factory, use_uvloop):
+    if use_uvloop:
+        loop = uvloop.new_event_loop()
+    else:
+        loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro_factory())
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000, help="CPU hot path iterations")
+    parser.add_argument("--requests", type=int, default=5000, help="Local HTTP round trips per loop")
+    args = parser.parse_args()
+
+    decoders = [("json", json.loads)]
+    if orjson is not None:
+        decoders.append(("orjson", orjson.loads))
+    loops = [("asyncio", False)]
+    if uvloop is not None and sys.platform != "win32":
+        loops.append(("uvloop", True))
+
+    print(f"Python {sys.version.split()[0]}, orjson {'installed' if orjson else 'missing'}, "
+          f"uvloop {'installed' if uvloop else 'missing'}")
+    print()
+    print(f"{'Benchmark':<34}{'Stack':<18}{'Total (s)':>10}{'Per op (us)':>13}{'Speedup':>9}")
+
+    def report(name, results, count):
+        baseline = results[0][1]
+        for stack, elapsed in results:
+            print(f"{name:<34}{stack:<18}{elapsed:>10.3f}{elapsed / count * 1e6:>13.2f}{baseline / elapsed:>8.2f}x")
+
+    report("Redemption (sign + decode x2)",
+           [(name, bench_redemption(loads, args.iterations)) for name, loads in decoders], args.iterations)
+    report("Profile response decode",
+           [(name, bench_profile_decode(loads, args.iterations)) for name, loads in decoders], args.iterations)
+
+    roundtrips = []
+    for loop_name, use_uvloop in loops:
+        for decoder_name, loads in decoders:
+            elapsed = run_loop(lambda: profile_roundtrips(loads, args.requests), use_uvloop)
+            roundtrips.append((f"{loop_name}+{decoder_name}", elapsed))
+    report("Profile HTTP round trip", roundtrips, args.requests)
+
+
+if __name__ == "__main__":
+    main()
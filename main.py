@@ -1,17 +1,43 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import hashlib
+import hmac
+import ipaddress
 import time
 import sqlite3
 import aiohttp
+from aiohttp import web
 import json
 import asyncio
 import ssl
 import os
+import re
+import unicodedata
+import csv
+import gzip
+import io
+import shutil
+import tempfile
+import sys
+import threading
+import traceback
+import cProfile
+import pstats
+from collections import Counter, OrderedDict, deque
 from datetime import datetime
 from requests.adapters import HTTPAdapter, Retry
 import logging
 
+# Optional accelerators, enabled with ACCELERATE=true in settings.txt
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Setup Logging
 logging.basicConfig(
     level=logging.INFO,  # Change to DEBUG for more detailed logs
@@ -31,9 +57,26 @@ EMOJI_LANGUAGE_MAP = {
     # '🇯🇵': 'JA',  # Japanese
 }
 
+# Languages supported by DeepL
+DEEPL_SUPPORTED_LANGUAGES = {
+    'EN': 'English',
+    'ES': 'Spanish',
+    'DE': 'German',
+    'FR': 'French',
+    'IT': 'Italian',
+    'NL': 'Dutch',
+    'PL': 'Polish',
+    'PT': 'Portuguese',
+    'RU': 'Russian',
+    'ZH': 'Chinese',
+    # Add more languages as needed
+}
+
 # Configuration Constants
 DB_FILE = 'gift_db.sqlite'
 SETTINGS_FILE = 'settings.txt'
+MAPPINGS_FILE = 'mappings.json'   # Optional overrides for the mappings below, picked up by /reload
+CONFIG_WATCH_INTERVAL = 10        # Seconds between settings/mappings file checks when CONFIG_WATCH=true
 
 # Role prefixes for primary roles
 ROLE_PREFIXES = {
@@ -54,10 +97,32 @@ SECONDARY_PREFIXES = {
     1264549766692339814: "[R5] "    # Prefix for R5 role
 }
 
+# Default alliance colors (used when a guild has no overrides)
+DEFAULT_ALLIANCE_COLORS = {
+    "SBZ": discord.Color.yellow(),
+    "PVP": discord.Color.orange(),
+    "SIN": discord.Color.red(),
+    "WPA": discord.Color.green(),
+    "Wrk": discord.Color.pink(),
+    "WTF": discord.Color.blue(),
+    "JaA": discord.Color.magenta(),
+    "CHL": discord.Color.purple(),
+    "T": discord.Color.light_grey(),
+    "None": discord.Color.greyple(),
+}
+
+# Per-guild settings that can be overridden with /guildset
+GUILD_SETTING_KEYS = ('alliance_name', 'channel_id', 'welcome_channel_id')
+
 # URLs and Configurations for API calls
 wos_player_info_url = "https://wos-giftcode-api.centurygame.com/api/player"
 wos_giftcode_url = "https://wos-giftcode-api.centurygame.com/api/gift_code"
 wos_encrypt_key = "tB87#kPtkxqOS2"
+wos_headers = {
+    "accept": "application/json, text/plain, */*",
+    "content-type": "application/x-www-form-urlencoded",
+    "origin": wos_giftcode_url,
+}
 
 # Retry configuration for requests
 retry_config = Retry(
@@ -67,6 +132,88 @@ retry_config = Retry(
     allowed_methods=["POST"]
 )
 
+# Retry queue configuration for failed gift code redemptions
+RETRYABLE_STATUSES = {"NOT_LOGIN_FAILED", "ERROR"}
+RETRY_BASE_DELAY = 60           # Seconds before the first retry, doubled on every attempt
+RETRY_MAX_DELAY = 6 * 60 * 60   # Upper bound for the backoff delay
+RETRY_MAX_ATTEMPTS = 8          # Entries are dropped after this many failed attempts
+RETRY_PLAYERS_PER_DRAIN = 50    # Players processed per drain to stay within the API budget
+RETRY_PLAYER_DELAY = 1          # Seconds to wait between players while draining
+RETRY_DRAIN_INTERVAL = 5        # Minutes between background drains
+
+# Statuses meaning the player has the code's rewards, whether the bot or the player redeemed it
+REDEEMED_STATUSES = ("SUCCESS", "ALREADY_RECEIVED")
+
+# Redemption status to giftcode_stats column mapping; unknown statuses count as errors
+GIFTCODE_STAT_COLUMNS = {
+    "SUCCESS": "success_count",
+    "ALREADY_RECEIVED": "already_received_count",
+    "ALREADY_REDEEMED_SIMILAR_CODE": "similar_code_count",
+    "NOT_LOGIN_FAILED": "login_failed_count",
+    "ERROR": "error_count",
+}
+
+# Export/import configuration
+EXPORT_TABLES = {
+    'users': ('users', ('fid', 'nickname', 'furnace_lv', 'discord_id', 'guild_id')),
+    'history': ('gift_code_history', ('fid', 'giftcode', 'redeemed_at')),
+    'furnace': ('furnace_history', ('fid', 'observed_at', 'furnace_lv', 'nickname')),
+}
+EXPORT_FORMATS = ('csv', 'jsonl')
+EXPORT_FETCH_SIZE = 500                    # Rows pulled from the cursor at a time
+EXPORT_GZIP_THRESHOLD = 1024 * 1024        # Exports larger than this (bytes) are gzipped
+IMPORT_BATCH_SIZE = 500                    # Rows inserted per transaction on import
+
+# Translation pipeline configuration
+TRANSLATION_WORKERS = 3            # Concurrent DeepL requests / DMs
+TRANSLATION_QUEUE_SIZE = 100       # Jobs queued across all users before new ones are shed
+TRANSLATION_USER_QUEUE_SIZE = 5    # Jobs queued per user before new ones are shed
+TRANSLATION_USER_RATE = 10         # Translations per user per window
+TRANSLATION_GLOBAL_RATE = 120      # Translations across all users per window
+TRANSLATION_RATE_WINDOW = 60       # Seconds
+MESSAGE_CACHE_SIZE = 256           # Fetched messages kept for repeated reactions
+
+# Low-memory member cache configuration (LOW_MEMORY_MEMBERS=true)
+MEMBER_LRU_SIZE = 512              # Members fetched on demand and kept in memory
+MEMBER_LRU_TTL = 300               # Seconds before a fetched member is refreshed
+
+# Backup configuration
+BACKUP_DIR = 'backups'
+BACKUP_INTERVAL_HOURS = 6          # Hours between scheduled backups
+BACKUP_KEEP = 10                   # Compressed snapshots kept before the oldest are removed
+BACKUP_PAGES_PER_STEP = 64         # Pages copied per backup step
+BACKUP_STEP_SLEEP = 0.01           # Seconds between steps so writers are never starved
+
+# Profile rendering
+GAME_LOGO_FILE = 'game_logo.png'
+FURNACE_BANDS = ((35, "FC-1"), (40, "FC-2"), (45, "FC-3"))  # Lowest furnace level of each band
+FURNACE_TABLE_SIZE = 100           # Furnace levels with a precomputed display string
+PROFILE_CACHE_TTL = 60             # Seconds a rendered profile embed is reused (0 disables)
+PROFILE_CACHE_SIZE = 256           # Rendered profile embeds kept
+
+# Welcome message batching
+WELCOME_BATCH_WINDOW = 5           # Seconds joins are buffered before one welcome message is sent
+MESSAGE_CHAR_LIMIT = 2000          # Discord message length limit
+
+# Furnace level history configuration
+FURNACE_HISTORY_FLUSH_INTERVAL = 60     # Seconds between batched writes of buffered furnace changes
+FURNACE_HISTORY_BATCH_SIZE = 200        # Buffered changes that trigger an early flush
+FURNACE_HISTORY_DOWNSAMPLE_DAYS = 90    # Older observations are thinned to the last one per player per week
+FURNACE_HISTORY_RETENTION_DAYS = 730    # Observations older than this are deleted
+GROWTH_DEFAULT_DAYS = 30                # Period /growth covers when no day count is given
+GROWTH_TOP_PLAYERS = 15                 # Players listed in an alliance /growth report
+
+# Read-only HTTP API configuration (enabled with API_PORT in settings.txt)
+API_JOB_HISTORY = 20                    # Finished redemption jobs kept for /jobs
+API_RESPONSE_CACHE_SIZE = 256           # Serialized responses kept for ETag revalidation
+
+# Event loop lag monitor and profiler configuration
+LOOP_LAG_INTERVAL = 0.25           # Seconds between loop heartbeats
+LOOP_LAG_THRESHOLD = 0.5           # Blocking longer than this (seconds) is logged with a stack trace
+PROFILE_MAX_SECONDS = 120          # Longest profiling session /perfprofile will run
+PROFILE_SAMPLE_INTERVAL = 0.005    # Seconds between stack samples in sampling mode
+PROFILE_TOP_FUNCTIONS = 40         # Functions listed in each profiler report section
+
 # Load Settings from File
 def load_settings():
     default_settings = {
@@ -75,7 +222,14 @@ def load_settings():
         'CHANNEL_ID': '',
         'WELCOME_CHANNEL_ID': '',
         'ALLIANCE_NAME': '',
-        'DEEPL_API_KEY': ''
+        'DEEPL_API_KEY': '',
+        'AUTO_SHARD': 'false',
+        'CONFIG_WATCH': 'false',
+        'LOW_MEMORY_MEMBERS': 'false',
+        'ACCELERATE': 'false',
+        'API_HOST': '127.0.0.1',
+        'API_PORT': '',
+        'API_TOKEN': ''
     }
     if not os.path.exists(SETTINGS_FILE):
         with open(SETTINGS_FILE, 'w') as f:
@@ -83,21 +237,155 @@ def load_settings():
                 f.write(f"{key}={value}\n")
         print("Settings file created. Please fill in and restart.")
         exit()
+    return parse_settings()
+
+def parse_settings():
     with open(SETTINGS_FILE, 'r') as f:
-        return dict(line.strip().split('=') for line in f if '=' in line)
+        return dict(line.strip().split('=', 1) for line in f if '=' in line)
+
+def load_mappings():
+    """Reads the optional mappings file. Returns an empty dict when it does not exist."""
+    if not os.path.exists(MAPPINGS_FILE):
+        return {}
+    with open(MAPPINGS_FILE, 'r', encoding='utf-8') as f:
+        mappings = json.load(f)
+    if not isinstance(mappings, dict):
+        raise ValueError(f"{MAPPINGS_FILE} must contain a JSON object.")
+    return mappings
+
+def build_config(settings, mappings):
+    """
+    Validates parsed settings and mappings and returns the values for the
+    module-level configuration globals. Raises ValueError on invalid input
+    so a bad edit never replaces a working configuration.
+    """
+    for key in ('BOT_TOKEN', 'SECRET', 'CHANNEL_ID', 'WELCOME_CHANNEL_ID', 'ALLIANCE_NAME', 'DEEPL_API_KEY'):
+        if key not in settings:
+            raise ValueError(f"{SETTINGS_FILE} is missing {key}.")
+
+    def as_int(key, value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be an integer, got {value!r}.")
+
+    def string_map(name, default):
+        mapping = mappings.get(name, default)
+        if not isinstance(mapping, dict) or not all(isinstance(k, str) and isinstance(v, str) for k, v in mapping.items()):
+            raise ValueError(f"{name} in {MAPPINGS_FILE} must map strings to strings.")
+        return dict(mapping)
+
+    def prefix_map(name, default):
+        mapping = mappings.get(name, default)
+        if not isinstance(mapping, dict):
+            raise ValueError(f"{name} in {MAPPINGS_FILE} must be an object of role ID to prefix.")
+        prefixes = {}
+        for role_id, prefix in mapping.items():
+            if not isinstance(prefix, str):
+                raise ValueError(f"Prefix for role {role_id} in {name} must be a string.")
+            prefixes[as_int(f"{name} role ID", role_id)] = prefix
+        return prefixes
+
+    def color_map(name, default):
+        mapping = mappings.get(name)
+        if mapping is None:
+            return dict(default)
+        if not isinstance(mapping, dict):
+            raise ValueError(f"{name} in {MAPPINGS_FILE} must be an object of alliance to hex color.")
+        colors = {}
+        for alliance, color in mapping.items():
+            try:
+                colors[alliance] = discord.Color(int(str(color).lstrip('#'), 16))
+            except ValueError:
+                raise ValueError(f"Color for {alliance} in {name} must be a hex value like #FFAA00.")
+        return colors
+
+    return {
+        'BOT_TOKEN': settings['BOT_TOKEN'],
+        'SECRET': settings['SECRET'],
+        'CHANNEL_ID': as_int('CHANNEL_ID', settings['CHANNEL_ID']),
+        'WELCOME_CHANNEL_ID': as_int('WELCOME_CHANNEL_ID', settings['WELCOME_CHANNEL_ID']),
+        'ALLIANCE_NAME': settings['ALLIANCE_NAME'],
+        'DEEPL_API_KEY': settings['DEEPL_API_KEY'],
+        'AUTO_SHARD': settings.get('AUTO_SHARD', 'false').strip().lower() == 'true',
+        'CONFIG_WATCH': settings.get('CONFIG_WATCH', 'false').strip().lower() == 'true',
+        'LOW_MEMORY_MEMBERS': settings.get('LOW_MEMORY_MEMBERS', 'false').strip().lower() == 'true',
+        'ACCELERATE': settings.get('ACCELERATE', 'false').strip().lower() == 'true',
+        'API_HOST': settings.get('API_HOST', '127.0.0.1').strip() or '127.0.0.1',
+        'API_PORT': as_int('API_PORT', settings['API_PORT']) if settings.get('API_PORT', '').strip() else 0,
+        'API_TOKEN': settings.get('API_TOKEN', '').strip(),
+        'EMOJI_LANGUAGE_MAP': string_map('emoji_language_map', BUILTIN_MAPPINGS['EMOJI_LANGUAGE_MAP']),
+        'DEEPL_SUPPORTED_LANGUAGES': string_map('deepl_supported_languages', BUILTIN_MAPPINGS['DEEPL_SUPPORTED_LANGUAGES']),
+        'ROLE_PREFIXES': prefix_map('role_prefixes', BUILTIN_MAPPINGS['ROLE_PREFIXES']),
+        'SECONDARY_PREFIXES': prefix_map('secondary_prefixes', BUILTIN_MAPPINGS['SECONDARY_PREFIXES']),
+        'DEFAULT_ALLIANCE_COLORS': color_map('alliance_colors', BUILTIN_MAPPINGS['DEFAULT_ALLIANCE_COLORS']),
+    }
+
+# Built-in mappings, used for any mapping not overridden in MAPPINGS_FILE
+BUILTIN_MAPPINGS = {
+    'EMOJI_LANGUAGE_MAP': dict(EMOJI_LANGUAGE_MAP),
+    'DEEPL_SUPPORTED_LANGUAGES': dict(DEEPL_SUPPORTED_LANGUAGES),
+    'ROLE_PREFIXES': dict(ROLE_PREFIXES),
+    'SECONDARY_PREFIXES': dict(SECONDARY_PREFIXES),
+    'DEFAULT_ALLIANCE_COLORS': dict(DEFAULT_ALLIANCE_COLORS),
+}
+
+# Settings that only take effect on a full restart
+RESTART_ONLY_SETTINGS = ('BOT_TOKEN', 'AUTO_SHARD', 'LOW_MEMORY_MEMBERS', 'ACCELERATE', 'API_HOST', 'API_PORT')
 
 settings = load_settings()
-BOT_TOKEN = settings['BOT_TOKEN']
-SECRET = settings['SECRET']
-CHANNEL_ID = int(settings['CHANNEL_ID'])
-WELCOME_CHANNEL_ID = int(settings['WELCOME_CHANNEL_ID'])
-ALLIANCE_NAME = settings['ALLIANCE_NAME']
-DEEPL_API_KEY = settings['DEEPL_API_KEY']
+startup_config = build_config(settings, load_mappings())
+BOT_TOKEN = startup_config['BOT_TOKEN']
+SECRET = startup_config['SECRET']
+CHANNEL_ID = startup_config['CHANNEL_ID']
+WELCOME_CHANNEL_ID = startup_config['WELCOME_CHANNEL_ID']
+ALLIANCE_NAME = startup_config['ALLIANCE_NAME']
+DEEPL_API_KEY = startup_config['DEEPL_API_KEY']
+AUTO_SHARD = startup_config['AUTO_SHARD']
+CONFIG_WATCH = startup_config['CONFIG_WATCH']
+LOW_MEMORY_MEMBERS = startup_config['LOW_MEMORY_MEMBERS']
+ACCELERATE = startup_config['ACCELERATE']
+API_HOST = startup_config['API_HOST']
+API_PORT = startup_config['API_PORT']
+API_TOKEN = startup_config['API_TOKEN']
+EMOJI_LANGUAGE_MAP = startup_config['EMOJI_LANGUAGE_MAP']
+DEEPL_SUPPORTED_LANGUAGES = startup_config['DEEPL_SUPPORTED_LANGUAGES']
+ROLE_PREFIXES = startup_config['ROLE_PREFIXES']
+SECONDARY_PREFIXES = startup_config['SECONDARY_PREFIXES']
+DEFAULT_ALLIANCE_COLORS = startup_config['DEFAULT_ALLIANCE_COLORS']
+
+# JSON decoding for API responses; orjson when accelerated and installed
+if ACCELERATE and orjson is not None:
+    json_loads = orjson.loads
+else:
+    json_loads = json.loads
+
+if ACCELERATE:
+    logging.info(
+        f"Acceleration enabled: orjson {'on' if orjson else 'not installed'}, "
+        f"uvloop {'on' if uvloop and sys.platform != 'win32' else 'not available'}."
+    )
 
 # Initialize Discord Bot
 intents = discord.Intents.default()
 intents.message_content, intents.members = True, True
-bot = commands.Bot(command_prefix='/', intents=intents)
+bot_class = commands.AutoShardedBot if AUTO_SHARD else commands.Bot
+
+class GiftBot(bot_class):
+    async def close(self):
+        # Persist furnace changes still waiting in the write buffer before shutting down
+        flush_furnace_history()
+        await super().close()
+
+if LOW_MEMORY_MEMBERS:
+    # Skip startup chunking and only keep members that join or are updated while the bot runs;
+    # everyone else is fetched on demand through get_member(). Role changes of members that
+    # were not cached yet are picked up from the audit log (see on_audit_log_entry_create)
+    member_cache_flags = discord.MemberCacheFlags.none()
+    member_cache_flags.joined = True
+    bot = GiftBot(command_prefix='/', intents=intents, member_cache_flags=member_cache_flags, chunk_guilds_at_startup=False)
+else:
+    bot = GiftBot(command_prefix='/', intents=intents)
 
 # Database Context Manager
 class Database:
@@ -111,6 +399,50 @@ class Database:
             self.conn.commit()
         self.conn.close()
 
+def rebuild_giftcode_stats(db):
+    """
+    Recomputes giftcode_stats from the per-player outcomes and the retry queue.
+    History and queue rows without an outcome (e.g. from an import) are
+    backfilled into giftcode_outcomes first. Used to backfill the table and
+    after bulk imports.
+    """
+    now = datetime.now().isoformat()
+    redeemed = ", ".join(f"'{status}'" for status in REDEEMED_STATUSES)
+    db.execute(f"""
+        INSERT INTO giftcode_outcomes (fid, giftcode, status, redeemed_at, updated_at)
+        SELECT fid, giftcode, 'SUCCESS', redeemed_at, redeemed_at FROM gift_code_history WHERE true
+        ON CONFLICT(fid, giftcode) DO UPDATE SET
+            status=excluded.status,
+            redeemed_at=excluded.redeemed_at,
+            updated_at=excluded.updated_at
+        WHERE giftcode_outcomes.status NOT IN ({redeemed})
+    """)
+    db.execute("""
+        INSERT OR IGNORE INTO giftcode_outcomes (fid, giftcode, status)
+        SELECT fid, giftcode, last_status FROM giftcode_retry_queue
+    """)
+
+    known = ", ".join(f"'{status}'" for status in GIFTCODE_STAT_COLUMNS if GIFTCODE_STAT_COLUMNS[status] != "error_count")
+    counts = ", ".join(
+        f"SUM(status = '{status}')" for status, column in GIFTCODE_STAT_COLUMNS.items() if column != "error_count"
+    )
+    columns = ", ".join(column for column in GIFTCODE_STAT_COLUMNS.values() if column != "error_count")
+    db.execute("DELETE FROM giftcode_stats")
+    db.execute(f"""
+        INSERT INTO giftcode_stats (guild_id, giftcode, {columns}, error_count, pending_count, first_redeemed_at, last_redeemed_at, updated_at)
+        SELECT COALESCE(u.guild_id, 0) AS guild_key, o.giftcode, {counts}, SUM(status NOT IN ({known})),
+               (SELECT COUNT(*) FROM giftcode_retry_queue q LEFT JOIN users qu ON qu.fid = q.fid
+                WHERE q.giftcode = o.giftcode AND COALESCE(qu.guild_id, 0) = COALESCE(u.guild_id, 0)),
+               MIN(redeemed_at), MAX(redeemed_at), ?
+        FROM giftcode_outcomes o LEFT JOIN users u ON u.fid = o.fid
+        GROUP BY guild_key, o.giftcode
+    """, (now,))
+
+def rebuild_giftcode_stats_now():
+    """Runs rebuild_giftcode_stats in its own transaction."""
+    with Database() as db:
+        rebuild_giftcode_stats(db)
+
 # Database Initialization
 def initialize_db():
     with Database() as db:
@@ -119,6 +451,12 @@ def initialize_db():
                           nickname TEXT,
                           furnace_lv INTEGER DEFAULT 0,
                           discord_id INTEGER UNIQUE)''')
+
+        # Per-guild scoping of the roster; NULL rows predate multi-guild support
+        db.execute("PRAGMA table_info(users)")
+        if 'guild_id' not in [column[1] for column in db.fetchall()]:
+            db.execute("ALTER TABLE users ADD COLUMN guild_id INTEGER")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_users_guild ON users(guild_id)")
         
         db.execute('''CREATE TABLE IF NOT EXISTS gift_code_history (
                           fid INTEGER,
@@ -126,29 +464,570 @@ def initialize_db():
                           redeemed_at TIMESTAMP,
                           PRIMARY KEY(fid, giftcode))''')
 
+        db.execute('''CREATE TABLE IF NOT EXISTS giftcode_retry_queue (
+                          fid INTEGER,
+                          giftcode TEXT,
+                          attempts INTEGER DEFAULT 0,
+                          last_status TEXT,
+                          next_attempt_at REAL,
+                          PRIMARY KEY(fid, giftcode))''')
+        db.execute("CREATE INDEX IF NOT EXISTS idx_retry_next_attempt ON giftcode_retry_queue(next_attempt_at)")
+
+        # Latest outcome per (fid, giftcode); the stats below count players by it
+        db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='giftcode_outcomes'")
+        outcomes_exist = db.fetchone() is not None
+        db.execute('''CREATE TABLE IF NOT EXISTS giftcode_outcomes (
+                          fid INTEGER,
+                          giftcode TEXT,
+                          status TEXT,
+                          redeemed_at TIMESTAMP,
+                          updated_at TIMESTAMP,
+                          PRIMARY KEY(fid, giftcode))''')
+        db.execute("CREATE INDEX IF NOT EXISTS idx_outcomes_giftcode ON giftcode_outcomes(giftcode, status)")
+
+        # Per-guild, per-code summary, maintained incrementally by record_giftcode_result.
+        # guild_id is the player's roster guild, 0 for players that predate multi-guild support
+        db.execute("PRAGMA table_info(giftcode_stats)")
+        stats_columns = [column[1] for column in db.fetchall()]
+        if stats_columns and 'guild_id' not in stats_columns:
+            db.execute("DROP TABLE giftcode_stats")
+        stats_exists = 'guild_id' in stats_columns
+        db.execute('''CREATE TABLE IF NOT EXISTS giftcode_stats (
+                          guild_id INTEGER DEFAULT 0,
+                          giftcode TEXT,
+                          success_count INTEGER DEFAULT 0,
+                          already_received_count INTEGER DEFAULT 0,
+                          similar_code_count INTEGER DEFAULT 0,
+                          login_failed_count INTEGER DEFAULT 0,
+                          error_count INTEGER DEFAULT 0,
+                          pending_count INTEGER DEFAULT 0,
+                          first_redeemed_at TIMESTAMP,
+                          last_redeemed_at TIMESTAMP,
+                          updated_at TIMESTAMP,
+                          PRIMARY KEY(guild_id, giftcode))''')
+        db.execute("CREATE INDEX IF NOT EXISTS idx_history_giftcode ON gift_code_history(giftcode, fid)")
+        if not stats_exists or not outcomes_exist:
+            # Older databases counted attempts; recount them as one outcome per player
+            rebuild_giftcode_stats(db)
+
+        # Furnace level time series: one row per observed change, keyed for per-player range scans
+        db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='furnace_history'")
+        furnace_history_exists = db.fetchone() is not None
+        db.execute('''CREATE TABLE IF NOT EXISTS furnace_history (
+                          fid INTEGER,
+                          observed_at INTEGER,
+                          furnace_lv INTEGER,
+                          nickname TEXT,
+                          PRIMARY KEY(fid, observed_at)) WITHOUT ROWID''')
+        db.execute("CREATE INDEX IF NOT EXISTS idx_furnace_history_observed ON furnace_history(observed_at)")
+        if not furnace_history_exists:
+            # Baseline so growth is measured from the moment tracking started
+            db.execute(
+                "INSERT INTO furnace_history (fid, observed_at, furnace_lv, nickname) SELECT fid, ?, furnace_lv, nickname FROM users",
+                (int(time.time()),)
+            )
+
+        # Per-guild configuration
+        db.execute('''CREATE TABLE IF NOT EXISTS guild_prefix_roles (
+                          guild_id INTEGER,
+                          role_id INTEGER,
+                          prefix TEXT,
+                          is_secondary INTEGER DEFAULT 0,
+                          PRIMARY KEY(guild_id, role_id))''')
+        db.execute('''CREATE TABLE IF NOT EXISTS guild_alliance_colors (
+                          guild_id INTEGER,
+                          alliance TEXT,
+                          color INTEGER,
+                          PRIMARY KEY(guild_id, alliance))''')
+        db.execute('''CREATE TABLE IF NOT EXISTS guild_settings (
+                          guild_id INTEGER,
+                          key TEXT,
+                          value TEXT,
+                          PRIMARY KEY(guild_id, key))''')
+
 initialize_db()
 
+# Guild Configuration Cache
+class GuildConfig:
+    """Resolved configuration for a single guild."""
+    __slots__ = ('role_prefixes', 'secondary_prefixes', 'alliance_colors', 'alliance_name', 'channel_id', 'welcome_channel_id',
+                 'primary_roles', 'secondary_roles')
+
+    def __init__(self, role_prefixes, secondary_prefixes, alliance_colors, alliance_name, channel_id, welcome_channel_id):
+        self.role_prefixes = role_prefixes
+        self.secondary_prefixes = secondary_prefixes
+        self.alliance_colors = alliance_colors
+        self.alliance_name = alliance_name
+        self.channel_id = channel_id
+        self.welcome_channel_id = welcome_channel_id
+
+        # Precomputed role lookups for profile rendering: (role_id, prefix, tag, color)
+        greyple = discord.Color.greyple()
+        self.primary_roles = tuple(
+            (role_id, prefix, prefix.strip("[] "), alliance_colors.get(prefix.strip("[] ").upper(), greyple))
+            for role_id, prefix in role_prefixes.items()
+        )
+        self.secondary_roles = tuple(
+            (role_id, prefix, prefix.strip("[] ")) for role_id, prefix in secondary_prefixes.items()
+        )
+
+    @property
+    def all_prefixes(self):
+        return list(self.role_prefixes.values()) + list(self.secondary_prefixes.values())
+
+class GuildConfigCache:
+    """
+    Loads per-guild configuration from the database once and serves it from memory.
+    Guilds without rows fall back to the settings.txt values and module defaults.
+    Call invalidate() after changing any guild_* table.
+    """
+    def __init__(self):
+        self._configs = {}
+
+    def get(self, guild_id):
+        config = self._configs.get(guild_id)
+        if config is None:
+            config = self._configs[guild_id] = self._load(guild_id)
+        return config
+
+    def invalidate(self, guild_id=None):
+        if guild_id is None:
+            self._configs.clear()
+        else:
+            self._configs.pop(guild_id, None)
+        # Rendered profiles carry the guild's prefixes and colors
+        profile_cache.invalidate(guild_id)
+
+    def _load(self, guild_id):
+        with Database() as db:
+            db.execute("SELECT role_id, prefix, is_secondary FROM guild_prefix_roles WHERE guild_id=?", (guild_id,))
+            prefix_rows = db.fetchall()
+            db.execute("SELECT alliance, color FROM guild_alliance_colors WHERE guild_id=?", (guild_id,))
+            color_rows = db.fetchall()
+            db.execute("SELECT key, value FROM guild_settings WHERE guild_id=?", (guild_id,))
+            overrides = dict(db.fetchall())
+
+        if prefix_rows:
+            role_prefixes = {role_id: prefix for role_id, prefix, is_secondary in prefix_rows if not is_secondary}
+            secondary_prefixes = {role_id: prefix for role_id, prefix, is_secondary in prefix_rows if is_secondary}
+        else:
+            role_prefixes, secondary_prefixes = ROLE_PREFIXES, SECONDARY_PREFIXES
+
+        alliance_colors = dict(DEFAULT_ALLIANCE_COLORS)
+        alliance_colors.update({alliance.upper(): discord.Color(color) for alliance, color in color_rows})
+
+        return GuildConfig(
+            role_prefixes,
+            secondary_prefixes,
+            alliance_colors,
+            overrides.get('alliance_name', ALLIANCE_NAME),
+            int(overrides.get('channel_id', CHANNEL_ID)),
+            int(overrides.get('welcome_channel_id', WELCOME_CHANNEL_ID)),
+        )
+
+guild_configs = GuildConfigCache()
+
+def get_guild_config(guild):
+    """Returns the cached configuration for a guild (or the defaults outside of one)."""
+    return guild_configs.get(guild.id if guild else None)
+
 # Prefix Handling Utility
-def clean_nickname(nickname):
-    prefixes = list(ROLE_PREFIXES.values()) + list(SECONDARY_PREFIXES.values())
+def clean_nickname(nickname, config=None):
+    prefixes = (config or get_guild_config(None)).all_prefixes
     for prefix in prefixes:
         if nickname.startswith(prefix):
             nickname = nickname[len(prefix):].strip()
     return nickname
 
 
+# Nickname Search Index
+class NicknameIndex:
+    """
+    In-memory trigram index over users.nickname for ranked prefix and fuzzy lookups.
+    Kept in sync by calling update()/remove() wherever the users table is written.
+    """
+    def __init__(self):
+        self.nicknames = {}   # fid -> stored nickname
+        self.normalized = {}  # fid -> normalized nickname
+        self.gram_counts = {} # fid -> number of distinct trigrams
+        self.guilds = {}      # fid -> guild_id (None for unscoped legacy rows)
+        self.postings = {}    # trigram -> set of fids
+
+    @staticmethod
+    def normalize(nickname):
+        """Folds case and Unicode variants and drops clan tags and punctuation."""
+        nickname = unicodedata.normalize('NFKC', nickname or '')
+        nickname = re.sub(r'\[[^\]]*\]|\([^)]*\)', '', nickname)
+        return ''.join(ch for ch in nickname.casefold() if ch.isalnum())
+
+    @staticmethod
+    def trigrams(text):
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def load(self, rows):
+        """Rebuilds the index from (fid, nickname, guild_id) rows."""
+        self.nicknames, self.normalized, self.gram_counts, self.guilds, self.postings = {}, {}, {}, {}, {}
+        for fid, nickname, guild_id in rows:
+            self.update(fid, nickname, guild_id)
+
+    def update(self, fid, nickname, guild_id=None):
+        """Adds or refreshes a nickname. A guild_id of None keeps the existing scope."""
+        fid = int(fid)
+        guild_id = guild_id if guild_id is not None else self.guilds.get(fid)
+        self.remove(fid)
+        self.guilds[fid] = guild_id
+        normalized = self.normalize(nickname)
+        self.nicknames[fid] = nickname
+        self.normalized[fid] = normalized
+        grams = self.trigrams(normalized)
+        self.gram_counts[fid] = len(grams)
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(fid)
+
+    def remove(self, fid):
+        fid = int(fid)
+        normalized = self.normalized.pop(fid, None)
+        self.nicknames.pop(fid, None)
+        self.gram_counts.pop(fid, None)
+        self.guilds.pop(fid, None)
+        if normalized is None:
+            return
+        for gram in self.trigrams(normalized):
+            fids = self.postings.get(gram)
+            if fids:
+                fids.discard(fid)
+                if not fids:
+                    del self.postings[gram]
+
+    def in_scope(self, fid, guild_id):
+        return guild_id is None or self.guilds.get(fid) in (None, guild_id)
+
+    def search(self, query, limit=10, min_similarity=0.3, guild_id=None):
+        """
+        Returns up to `limit` (fid, nickname) matches ranked by exact, prefix,
+        substring and then trigram similarity, restricted to a guild's roster.
+        """
+        normalized = self.normalize(query)
+        if not normalized:
+            return [
+                (fid, nickname) for fid, nickname in self.nicknames.items()
+                if nickname == query and self.in_scope(fid, guild_id)
+            ][:limit]
+
+        query_grams = self.trigrams(normalized)
+        overlap = {}
+        for gram in query_grams:
+            for fid in self.postings.get(gram, ()):
+                overlap[fid] = overlap.get(fid, 0) + 1
+        if len(normalized) < 3:
+            # A short query shares no padded trigram with an interior substring, so scan for those
+            for fid, candidate in self.normalized.items():
+                if normalized in candidate:
+                    overlap.setdefault(fid, 0)
+
+        ranked = []
+        for fid, shared in overlap.items():
+            if not self.in_scope(fid, guild_id):
+                continue
+            candidate = self.normalized[fid]
+            if candidate == normalized:
+                tier = 3
+            elif candidate.startswith(normalized):
+                tier = 2
+            elif normalized in candidate:
+                tier = 1
+            else:
+                tier = 0
+            # Dice coefficient over trigram sets
+            similarity = 2 * shared / (len(query_grams) + self.gram_counts[fid])
+            if tier or similarity >= min_similarity:
+                ranked.append((tier, similarity, fid))
+
+        ranked.sort(reverse=True)
+        return [(fid, self.nicknames[fid]) for _, _, fid in ranked[:limit]]
+
+# Furnace Level History
+class FurnaceHistory:
+    """
+    Buffers furnace level and nickname changes and appends them to the
+    furnace_history table in batches. The roster only records actual changes,
+    so refreshing an unchanged profile never touches the table.
+    """
+    def __init__(self):
+        self.pending = []
+
+    def record(self, fid, furnace_lv, nickname):
+        self.pending.append((fid, int(time.time()), furnace_lv, nickname))
+        if len(self.pending) >= FURNACE_HISTORY_BATCH_SIZE:
+            # Called from roster writes that already succeeded; a failed flush keeps the buffer and is only logged
+            flush_furnace_history()
+
+    def flush(self):
+        """Writes the buffered changes in one transaction. Returns the number of rows written."""
+        rows, self.pending = self.pending, []
+        if not rows:
+            return 0
+        try:
+            with Database() as db:
+                db.executemany("""
+                    INSERT INTO furnace_history (fid, observed_at, furnace_lv, nickname)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(fid, observed_at) DO UPDATE SET
+                        furnace_lv=excluded.furnace_lv,
+                        nickname=excluded.nickname
+                """, rows)
+        except sqlite3.Error:
+            # Keep the changes for the next flush
+            self.pending = rows + self.pending
+            raise
+        return len(rows)
+
+    @staticmethod
+    def compact(now=None):
+        """
+        Applies retention and downsampling: observations older than
+        FURNACE_HISTORY_RETENTION_DAYS are deleted, and those older than
+        FURNACE_HISTORY_DOWNSAMPLE_DAYS are thinned to the last one per player
+        per week. Runs on a worker thread.
+
+        :return: The number of rows removed.
+        """
+        now = int(now or time.time())
+        retention_cutoff = now - FURNACE_HISTORY_RETENTION_DAYS * 86400
+        downsample_cutoff = now - FURNACE_HISTORY_DOWNSAMPLE_DAYS * 86400
+        with Database() as db:
+            db.execute("DELETE FROM furnace_history WHERE observed_at < ?", (retention_cutoff,))
+            removed = db.rowcount
+            db.execute("""
+                DELETE FROM furnace_history
+                WHERE observed_at < :cutoff
+                  AND (fid, observed_at) NOT IN (
+                      SELECT fid, MAX(observed_at) FROM furnace_history
+                      WHERE observed_at < :cutoff
+                      GROUP BY fid, observed_at / 604800)
+            """, {'cutoff': downsample_cutoff})
+            removed += db.rowcount
+        return removed
+
+    @staticmethod
+    def levels_since(fids, since):
+        """
+        Returns {fid: furnace level at `since`} using two primary-key range lookups
+        per player: the last observation at or before `since`, else the first one
+        after it. Players without history are left out. Runs on a worker thread.
+        """
+        levels = {}
+        with Database() as db:
+            for fid in fids:
+                db.execute(
+                    "SELECT furnace_lv FROM furnace_history WHERE fid=? AND observed_at<=? ORDER BY observed_at DESC LIMIT 1",
+                    (fid, since)
+                )
+                row = db.fetchone()
+                if row is None:
+                    db.execute(
+                        "SELECT furnace_lv FROM furnace_history WHERE fid=? AND observed_at>? ORDER BY observed_at LIMIT 1",
+                        (fid, since)
+                    )
+                    row = db.fetchone()
+                if row is not None:
+                    levels[fid] = row[0]
+        return levels
+
+    @staticmethod
+    def changes_since(fid, since):
+        """Returns (observed_at, furnace_lv, nickname) rows after `since`, oldest first."""
+        with Database() as db:
+            db.execute(
+                "SELECT observed_at, furnace_lv, nickname FROM furnace_history WHERE fid=? AND observed_at>? ORDER BY observed_at",
+                (fid, since)
+            )
+            return db.fetchall()
+
+furnace_history = FurnaceHistory()
+
+def flush_furnace_history():
+    """Flushes buffered furnace changes, logging instead of raising on database errors."""
+    try:
+        furnace_history.flush()
+    except sqlite3.Error as e:
+        logging.error(f"Writing furnace history failed: {e}")
+
+# In-memory Roster
+class RosterEntry:
+    """One row of the users table."""
+    __slots__ = ('fid', 'nickname', 'furnace_lv', 'discord_id', 'guild_id')
+
+    def __init__(self, fid, nickname, furnace_lv, discord_id, guild_id):
+        self.fid = fid
+        self.nickname = nickname
+        self.furnace_lv = furnace_lv
+        self.discord_id = discord_id
+        self.guild_id = guild_id
+
+class Roster:
+    """
+    Write-through, in-memory copy of the users table indexed by fid and discord_id,
+    with a trigram index for nickname search. Every mutation writes to the database first and updates memory
+    only once the statement succeeded, so reads never need a DB round-trip.
+    """
+    def __init__(self):
+        self.by_fid = {}
+        self.by_discord_id = {}
+        self.search_index = NicknameIndex()
+        self.version = 0  # Bumped on every change, used for HTTP API ETags
+
+    def load(self):
+        """(Re)loads the whole roster from the database."""
+        with Database() as db:
+            db.execute("SELECT fid, nickname, furnace_lv, discord_id, guild_id FROM users")
+            rows = db.fetchall()
+        self.by_fid, self.by_discord_id = {}, {}
+        self.search_index.load([])
+        self.version += 1
+        for row in rows:
+            self._index(RosterEntry(*row))
+
+    def _index(self, entry):
+        self.version += 1
+        self.by_fid[entry.fid] = entry
+        if entry.discord_id is not None:
+            self.by_discord_id[entry.discord_id] = entry
+        self.search_index.update(entry.fid, entry.nickname, entry.guild_id)
+
+    def _unindex(self, entry):
+        self.version += 1
+        self.by_fid.pop(entry.fid, None)
+        if entry.discord_id is not None and self.by_discord_id.get(entry.discord_id) is entry:
+            del self.by_discord_id[entry.discord_id]
+        self.search_index.remove(entry.fid)
+
+    @staticmethod
+    def in_scope(entry, guild_id):
+        # Entries without a guild_id predate multi-guild support and are visible to every guild
+        return guild_id is None or entry.guild_id is None or entry.guild_id == guild_id
+
+    # Reads
+    def get(self, fid, guild_id=None):
+        entry = self.by_fid.get(int(fid))
+        return entry if entry and self.in_scope(entry, guild_id) else None
+
+    def get_by_discord_id(self, discord_id, guild_id=None):
+        entry = self.by_discord_id.get(discord_id)
+        return entry if entry and self.in_scope(entry, guild_id) else None
+
+    def is_foreign(self, fid, guild_id):
+        """True if the fid is on the roster but scoped to a different guild."""
+        entry = self.by_fid.get(int(fid))
+        return entry is not None and not self.in_scope(entry, guild_id)
+
+    def members(self, guild_id=None):
+        """Returns the entries visible to a guild, sorted by nickname."""
+        return sorted(
+            (entry for entry in self.by_fid.values() if self.in_scope(entry, guild_id)),
+            key=lambda entry: entry.nickname or ''
+        )
+
+    def search(self, query, guild_id=None):
+        return self.search_index.search(query, guild_id=guild_id)
+
+    # Write-through mutations
+    def add(self, fid, nickname, furnace_lv, guild_id):
+        """Inserts a new, unlinked user. Returns False if the fid already exists."""
+        fid = int(fid)
+        if fid in self.by_fid:
+            return False
+        with Database() as db:
+            db.execute(
+                "INSERT INTO users (fid, nickname, furnace_lv, guild_id) VALUES (?, ?, ?, ?)",
+                (fid, nickname, furnace_lv, guild_id)
+            )
+        self._index(RosterEntry(fid, nickname, furnace_lv, None, guild_id))
+        furnace_history.record(fid, furnace_lv, nickname)
+        return True
+
+    def update_profile(self, fid, nickname, furnace_lv):
+        """Refreshes a user's in-game nickname and furnace level. Returns the entry, or None if unknown."""
+        entry = self.by_fid.get(int(fid))
+        if entry is None:
+            return None
+        if (entry.nickname, entry.furnace_lv) == (nickname, furnace_lv):
+            return entry
+        with Database() as db:
+            db.execute("UPDATE users SET nickname=?, furnace_lv=? WHERE fid=?", (nickname, furnace_lv, entry.fid))
+        self._unindex(entry)
+        entry.nickname, entry.furnace_lv = nickname, furnace_lv
+        self._index(entry)
+        furnace_history.record(entry.fid, furnace_lv, nickname)
+        return entry
+
+    def link(self, fid, discord_id, nickname, furnace_lv, guild_id):
+        """
+        Creates or updates a user and links it to a Discord account. An existing
+        guild scope is kept. Raises sqlite3.IntegrityError if the Discord account
+        is already linked to another fid.
+        """
+        fid = int(fid)
+        with Database() as db:
+            db.execute("""
+                INSERT INTO users (fid, nickname, furnace_lv, discord_id, guild_id)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(fid) DO UPDATE SET
+                    nickname=excluded.nickname,
+                    furnace_lv=excluded.furnace_lv,
+                    discord_id=excluded.discord_id,
+                    guild_id=COALESCE(users.guild_id, excluded.guild_id)
+            """, (fid, nickname, furnace_lv, discord_id, guild_id))
+        previous = self.by_fid.get(fid)
+        if previous is not None:
+            self._unindex(previous)
+            guild_id = previous.guild_id if previous.guild_id is not None else guild_id
+        entry = RosterEntry(fid, nickname, furnace_lv, discord_id, guild_id)
+        self._index(entry)
+        if previous is None or (previous.nickname, previous.furnace_lv) != (nickname, furnace_lv):
+            furnace_history.record(fid, furnace_lv, nickname)
+        return entry
+
+    def remove(self, fid):
+        """Deletes a user. Returns the removed entry, or None if unknown."""
+        fid = int(fid)
+        with Database() as db:
+            db.execute("DELETE FROM users WHERE fid=?", (fid,))
+        entry = self.by_fid.get(fid)
+        if entry is not None:
+            self._unindex(entry)
+        return entry
+
+    def adopt(self, guild_id):
+        """Assigns every unscoped user to a guild. Returns the number of users adopted."""
+        with Database() as db:
+            db.execute("UPDATE users SET guild_id=? WHERE guild_id IS NULL", (guild_id,))
+        adopted = [entry for entry in self.by_fid.values() if entry.guild_id is None]
+        for entry in adopted:
+            self._unindex(entry)
+            entry.guild_id = guild_id
+            self._index(entry)
+        return len(adopted)
+
+roster = Roster()
+roster.load()
+
+
 # Helper to Update Nickname Based on Roles
 async def update_member_nickname(member):
+    config = get_guild_config(member.guild)
+
     # Clean the existing nickname to remove any prefixes
-    base_nickname = clean_nickname(member.nick or member.name)
+    base_nickname = clean_nickname(member.nick or member.name, config)
     
     # Determine the new prefix based on roles
     primary_prefix = next(
-        (prefix for role_id, prefix in ROLE_PREFIXES.items() if member.get_role(role_id)),
+        (prefix for role_id, prefix in config.role_prefixes.items() if member.get_role(role_id)),
         ""
     )
     secondary_prefix = next(
-        (prefix for role_id, prefix in SECONDARY_PREFIXES.items() if member.get_role(role_id)),
+        (prefix for role_id, prefix in config.secondary_prefixes.items() if member.get_role(role_id)),
         ""
     )
     
@@ -166,43 +1045,265 @@ async def update_member_nickname(member):
             print(f"HTTP Exception while changing nickname for {member.name}: {e}")
 
 # Event Listeners
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, commands.NoPrivateMessage):
+        await ctx.send("This command can only be used in a server.")
+        return
+    # Everything else keeps discord.py's default reporting
+    await type(bot).on_command_error(bot, ctx, error)
+
 @bot.event
 async def on_member_update(before, after):
     await update_member_nickname(after)
 
+@bot.event
+async def on_audit_log_entry_create(entry):
+    # Without chunking, discord.py only caches a member on its first GUILD_MEMBER_UPDATE and
+    # does not dispatch on_member_update, so that first role change is reconciled from the
+    # audit log instead. Needs the View Audit Log permission.
+    if not LOW_MEMORY_MEMBERS or entry.action != discord.AuditLogAction.member_role_update:
+        return
+    # The LRU copy predates the role change, so fetch the member's current roles
+    member = await get_member(entry.guild, getattr(entry.target, 'id', None), fresh=True)
+    if member is not None:
+        await update_member_nickname(member)
+
+# Pending welcome mentions per channel, flushed once per WELCOME_BATCH_WINDOW
+welcome_buffers = {}
+welcome_tasks = set()
+
+def chunk_welcome_messages(mentions):
+    """Builds welcome messages for a batch of mentions, split to fit the message limit."""
+    suffix = "! Please select your alliance and review the guidelines."
+    messages, current = [], []
+    for mention in mentions:
+        if current and len("Welcome, " + ", ".join(current + [mention]) + suffix) > MESSAGE_CHAR_LIMIT:
+            messages.append("Welcome, " + ", ".join(current) + suffix)
+            current = []
+        current.append(mention)
+    if current:
+        messages.append("Welcome, " + ", ".join(current) + suffix)
+    return messages
+
+async def flush_welcome_buffer(channel):
+    await asyncio.sleep(WELCOME_BATCH_WINDOW)
+    mentions = welcome_buffers.pop(channel.id, [])
+    for message in chunk_welcome_messages(mentions):
+        try:
+            await channel.send(message)
+        except discord.HTTPException as e:
+            logging.error(f"Failed to send welcome message in {channel.id}: {e}")
+
 @bot.event
 async def on_member_join(member):
-    welcome_channel = bot.get_channel(WELCOME_CHANNEL_ID)
+    welcome_channel = bot.get_channel(get_guild_config(member.guild).welcome_channel_id)
     if welcome_channel:
-        await welcome_channel.send(f"Welcome, {member.mention}! Please select your alliance and review the guidelines.")
+        # Join waves are coalesced into a single message instead of one per member
+        if welcome_channel.id not in welcome_buffers:
+            welcome_buffers[welcome_channel.id] = []
+            task = asyncio.create_task(flush_welcome_buffer(welcome_channel))
+            welcome_tasks.add(task)
+            task.add_done_callback(welcome_tasks.discard)
+        welcome_buffers[welcome_channel.id].append(member.mention)
 
 @bot.command(name='update_all_nicknames')
+@commands.guild_only()
 @commands.has_permissions(administrator=True)  # Ensure only admins can run this
 async def update_all_nicknames(ctx):
     await ctx.send("Starting to update all member nicknames...")
-    for member in ctx.guild.members:
-        await update_member_nickname(member)
+    if LOW_MEMORY_MEMBERS:
+        # The member cache is partial, so stream the full list from the API page by page
+        async for member in ctx.guild.fetch_members(limit=None):
+            await update_member_nickname(member)
+    else:
+        for member in ctx.guild.members:
+            await update_member_nickname(member)
     await ctx.send("Finished updating all member nicknames.")
 
+# On-demand Member Lookup
+member_lru = OrderedDict()  # (guild_id, member_id) -> (fetched_at, member or None)
 
-# API Request Helpers
-import requests
+async def get_member(guild, member_id, fresh=False):
+    """
+    Returns a guild member from the gateway cache, falling back to a small
+    TTL-bounded LRU and then to the API. Misses are cached as None too so
+    unlinked or departed members don't trigger a fetch on every lookup.
+    With fresh=True the LRU is skipped and its entry replaced by the fetch.
+    """
+    if not guild or not member_id:
+        return None
+    member = guild.get_member(member_id)
+    if member is not None:
+        return member
 
-# Helper Functions
+    key = (guild.id, member_id)
+    cached = None if fresh else member_lru.get(key)
+    if cached and time.monotonic() - cached[0] < MEMBER_LRU_TTL:
+        member_lru.move_to_end(key)
+        return cached[1]
 
-DEEPL_SUPPORTED_LANGUAGES = {
-    'EN': 'English',
-    'ES': 'Spanish',
-    'DE': 'German',
-    'FR': 'French',
-    'IT': 'Italian',
-    'NL': 'Dutch',
-    'PL': 'Polish',
-    'PT': 'Portuguese',
-    'RU': 'Russian',
-    'ZH': 'Chinese',
-    # Add more languages as needed
-}
+    try:
+        member = await guild.fetch_member(member_id)
+    except discord.NotFound:
+        member = None
+    except discord.HTTPException as e:
+        logging.error(f"Failed to fetch member {member_id}: {e}")
+        return None
+
+    member_lru[key] = (time.monotonic(), member)
+    member_lru.move_to_end(key)
+    while len(member_lru) > MEMBER_LRU_SIZE:
+        member_lru.popitem(last=False)
+    return member
+
+
+# Guild Configuration Commands
+def seed_guild_prefixes(db, guild):
+    """Copies the default prefix roles into a guild's table the first time it is customised."""
+    db.execute("SELECT 1 FROM guild_prefix_roles WHERE guild_id=? LIMIT 1", (guild.id,))
+    if db.fetchone():
+        return
+    rows = [(guild.id, role_id, prefix, 0) for role_id, prefix in ROLE_PREFIXES.items() if guild.get_role(role_id)]
+    rows += [(guild.id, role_id, prefix, 1) for role_id, prefix in SECONDARY_PREFIXES.items() if guild.get_role(role_id)]
+    db.executemany("INSERT OR IGNORE INTO guild_prefix_roles (guild_id, role_id, prefix, is_secondary) VALUES (?, ?, ?, ?)", rows)
+
+@bot.command(name='guildconfig')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+async def guild_config(ctx):
+    """Shows the prefix roles, alliance colors and settings in effect for this server."""
+    config = get_guild_config(ctx.guild)
+    embed = discord.Embed(title=f"Configuration for {ctx.guild.name}", color=discord.Color.blue())
+
+    primary = "\n".join(f"<@&{role_id}> → `{prefix.strip()}`" for role_id, prefix in config.role_prefixes.items())
+    secondary = "\n".join(f"<@&{role_id}> → `{prefix.strip()}`" for role_id, prefix in config.secondary_prefixes.items())
+    embed.add_field(name="Primary Prefixes", value=primary[:1024] or "None", inline=False)
+    embed.add_field(name="Secondary Prefixes", value=secondary[:1024] or "None", inline=False)
+    embed.add_field(
+        name="Settings",
+        value=(
+            f"**Alliance Name**: `{config.alliance_name}`\n"
+            f"**Channel**: <#{config.channel_id}>\n"
+            f"**Welcome Channel**: <#{config.welcome_channel_id}>"
+        ),
+        inline=False
+    )
+    await ctx.send(embed=embed)
+
+@bot.command(name='setprefix')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+async def set_prefix(ctx, role: discord.Role, prefix: str, kind: str = 'primary'):
+    """
+    Admin command to set the nickname prefix for a role in this server.
+
+    Usage:
+    /setprefix @Role TAG [primary|secondary]
+    """
+    if kind.lower() not in ('primary', 'secondary'):
+        await ctx.send("❌ The prefix kind must be `primary` or `secondary`.")
+        return
+    prefix = f"[{prefix.strip('[] ')}] "
+    with Database() as db:
+        seed_guild_prefixes(db, ctx.guild)
+        db.execute("""
+            INSERT INTO guild_prefix_roles (guild_id, role_id, prefix, is_secondary) VALUES (?, ?, ?, ?)
+            ON CONFLICT(guild_id, role_id) DO UPDATE SET prefix=excluded.prefix, is_secondary=excluded.is_secondary
+        """, (ctx.guild.id, role.id, prefix, int(kind.lower() == 'secondary')))
+    guild_configs.invalidate(ctx.guild.id)
+    logging.info(f"Admin {ctx.author} set {kind} prefix {prefix.strip()} for role {role} in guild {ctx.guild.id}.")
+    await ctx.send(f"✅ Members with {role.mention} will use the `{prefix.strip()}` prefix.")
+
+@bot.command(name='removeprefix')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+async def remove_prefix(ctx, role: discord.Role):
+    """
+    Admin command to remove a role's nickname prefix in this server.
+
+    Usage:
+    /removeprefix @Role
+    """
+    with Database() as db:
+        seed_guild_prefixes(db, ctx.guild)
+        db.execute("DELETE FROM guild_prefix_roles WHERE guild_id=? AND role_id=?", (ctx.guild.id, role.id))
+        removed = db.rowcount
+    guild_configs.invalidate(ctx.guild.id)
+    if removed:
+        await ctx.send(f"✅ Removed the prefix for {role.mention}.")
+    else:
+        await ctx.send(f"❌ {role.mention} has no prefix configured.")
+
+@bot.command(name='setalliancecolor')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+async def set_alliance_color(ctx, alliance: str, color: str):
+    """
+    Admin command to set the profile color for an alliance tag in this server.
+
+    Usage:
+    /setalliancecolor TAG #RRGGBB
+    """
+    try:
+        value = int(color.lstrip('#'), 16)
+    except ValueError:
+        await ctx.send("❌ Colors must be hex values like `#FFAA00`.")
+        return
+    with Database() as db:
+        db.execute("""
+            INSERT INTO guild_alliance_colors (guild_id, alliance, color) VALUES (?, ?, ?)
+            ON CONFLICT(guild_id, alliance) DO UPDATE SET color=excluded.color
+        """, (ctx.guild.id, alliance.strip('[] ').upper(), value))
+    guild_configs.invalidate(ctx.guild.id)
+    await ctx.send(f"✅ Alliance `{alliance.strip('[] ')}` will use color `#{value:06X}`.")
+
+@bot.command(name='guildset')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+async def guild_set(ctx, key: str, *, value: str):
+    """
+    Admin command to override a setting for this server.
+
+    Usage:
+    /guildset alliance_name|channel_id|welcome_channel_id value
+    """
+    key = key.lower()
+    if key not in GUILD_SETTING_KEYS:
+        await ctx.send(f"❌ Unknown setting. Choose one of: {', '.join(GUILD_SETTING_KEYS)}")
+        return
+    if key.endswith('channel_id'):
+        value = value.strip('<#>')
+        if not value.isdigit():
+            await ctx.send("❌ Channel settings must be a channel mention or ID.")
+            return
+    with Database() as db:
+        db.execute("""
+            INSERT INTO guild_settings (guild_id, key, value) VALUES (?, ?, ?)
+            ON CONFLICT(guild_id, key) DO UPDATE SET value=excluded.value
+        """, (ctx.guild.id, key, value))
+    guild_configs.invalidate(ctx.guild.id)
+    await ctx.send(f"✅ `{key}` set to `{value}` for this server.")
+
+@bot.command(name='adoptroster')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)
+async def adopt_roster(ctx):
+    """
+    Admin command to assign roster entries created before multi-server support to this server.
+
+    Usage:
+    /adoptroster
+    """
+    adopted = roster.adopt(ctx.guild.id)
+    if adopted:
+        # The adopted players' gift code stats move from the unscoped bucket to this guild
+        await asyncio.to_thread(rebuild_giftcode_stats_now)
+        giftcode_stats_cache.invalidate()
+    await ctx.send(f"✅ Assigned {adopted} unscoped roster entr{'y' if adopted == 1 else 'ies'} to this server.")
+
+# API Request Helpers
+import requests
 
 # Helper Functions
 
@@ -241,7 +1342,7 @@ async def translate_text(text: str, target_lang: str) -> str:
                 if response.status != 200:
                     logging.error(f"DeepL API error: {response.status} {response.reason}")
                     return None
-                result = await response.json()
+                result = await response.json(loads=json_loads)
         except aiohttp.ClientError as e:
             logging.error(f"Client error during translation: {e}")
             return None
@@ -254,23 +1355,176 @@ async def translate_text(text: str, target_lang: str) -> str:
         logging.error("Unexpected response format from DeepL API.")
         return None
 
+# Translation Pipeline
+class SlidingWindowLimiter:
+    """Allows at most `limit` events per `window` seconds for each key."""
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.events = {}
+
+    def allow(self, key=None):
+        now = time.monotonic()
+        events = self.events.setdefault(key, deque())
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if len(events) >= self.limit:
+            return False
+        events.append(now)
+        return True
+
+    def release(self, key=None):
+        """Gives back the most recent slot taken for a key, e.g. when the request was dropped."""
+        events = self.events.get(key)
+        if events:
+            events.pop()
+
+class FairQueue:
+    """
+    Bounded queue that serves users round-robin, so one user spamming
+    reactions cannot starve everybody else. put() returns False instead of
+    waiting when the user's or the global queue is full (load shedding).
+    """
+    def __init__(self, max_size, per_user_max):
+        self.max_size = max_size
+        self.per_user_max = per_user_max
+        self.pending = {}      # user_id -> deque of jobs
+        self.ready = deque()   # user_ids with pending jobs, in service order
+        self.size = 0
+        self.condition = asyncio.Condition()
+
+    async def put(self, user_id, job):
+        async with self.condition:
+            jobs = self.pending.get(user_id)
+            if self.size >= self.max_size or (jobs and len(jobs) >= self.per_user_max):
+                return False
+            if not jobs:
+                jobs = self.pending[user_id] = deque()
+                self.ready.append(user_id)
+            jobs.append(job)
+            self.size += 1
+            self.condition.notify()
+            return True
+
+    async def get(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.size > 0)
+            user_id = self.ready.popleft()
+            jobs = self.pending[user_id]
+            job = jobs.popleft()
+            if jobs:
+                self.ready.append(user_id)
+            else:
+                del self.pending[user_id]
+            self.size -= 1
+            return job
+
+class MessageLRU:
+    """Small LRU of fetched messages, keyed by message ID."""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.messages = OrderedDict()
+
+    def get(self, message_id):
+        message = self.messages.get(message_id)
+        if message is not None:
+            self.messages.move_to_end(message_id)
+        return message
+
+    def put(self, message):
+        self.messages[message.id] = message
+        self.messages.move_to_end(message.id)
+        while len(self.messages) > self.max_size:
+            self.messages.popitem(last=False)
+
+    def discard(self, message_id):
+        self.messages.pop(message_id, None)
+
+translation_queue = FairQueue(TRANSLATION_QUEUE_SIZE, TRANSLATION_USER_QUEUE_SIZE)
+translation_user_limiter = SlidingWindowLimiter(TRANSLATION_USER_RATE, TRANSLATION_RATE_WINDOW)
+translation_global_limiter = SlidingWindowLimiter(TRANSLATION_GLOBAL_RATE, TRANSLATION_RATE_WINDOW)
+message_cache = MessageLRU(MESSAGE_CACHE_SIZE)
+translation_workers = []
+
+async def get_reacted_message(channel_id, message_id):
+    """Returns a message from discord.py's cache, the local LRU, or the API."""
+    message = discord.utils.get(bot.cached_messages, id=message_id) or message_cache.get(message_id)
+    if message is None:
+        channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+        message = await channel.fetch_message(message_id)
+        message_cache.put(message)
+    return message
+
 @bot.event
-async def on_reaction_add(reaction, user):
+async def on_raw_reaction_add(payload):
     # Prevent the bot from responding to its own reactions
-    if user == bot.user:
+    if payload.user_id == bot.user.id:
+        return
+    # Bot messages are never translated, so don't let them take a rate slot
+    if payload.message_author_id == bot.user.id:
         return
 
     # Check if the reaction emoji is one we are tracking
-    if str(reaction.emoji) not in EMOJI_LANGUAGE_MAP:
+    if str(payload.emoji) not in EMOJI_LANGUAGE_MAP:
         return  # Ignore other emojis
 
-    target_language = EMOJI_LANGUAGE_MAP[str(reaction.emoji)]
+    # Rate caps protect the DeepL quota; excess reactions are dropped
+    if not translation_user_limiter.allow(payload.user_id):
+        logging.info(f"Translation rate limit reached for user {payload.user_id}, dropping request.")
+        return
+    if not translation_global_limiter.allow():
+        translation_user_limiter.release(payload.user_id)
+        logging.warning("Global translation rate limit reached, dropping request.")
+        return
+
+    if not await translation_queue.put(payload.user_id, payload):
+        # A shed request was never translated, so it must not count against the quotas
+        translation_user_limiter.release(payload.user_id)
+        translation_global_limiter.release()
+        logging.warning(f"Translation queue full, shedding request from user {payload.user_id}.")
+
+# Fetched messages are cached by ID; drop them on edit/delete so reactions never translate stale text
+@bot.event
+async def on_raw_message_edit(payload):
+    message_cache.discard(payload.message_id)
+
+@bot.event
+async def on_raw_message_delete(payload):
+    message_cache.discard(payload.message_id)
+
+@bot.event
+async def on_raw_bulk_message_delete(payload):
+    for message_id in payload.message_ids:
+        message_cache.discard(message_id)
+
+async def translation_worker():
+    while True:
+        payload = await translation_queue.get()
+        try:
+            await handle_translation_request(payload)
+        except Exception as e:
+            logging.error(f"Translation request for message {payload.message_id} failed: {e}")
+
+def start_translation_workers():
+    while len(translation_workers) < TRANSLATION_WORKERS:
+        translation_workers.append(asyncio.create_task(translation_worker()))
 
-    # Get the message that was reacted to
-    message = reaction.message
+async def handle_translation_request(payload):
+    target_language = EMOJI_LANGUAGE_MAP.get(str(payload.emoji))
+    if target_language is None:
+        return  # Mapping changed since the reaction was queued
+
+    try:
+        message = await get_reacted_message(payload.channel_id, payload.message_id)
+    except (discord.NotFound, discord.Forbidden):
+        return
+    user = payload.member or bot.get_user(payload.user_id) or await bot.fetch_user(payload.user_id)
 
     # Prevent translating bot messages to avoid loops or unnecessary translations
     if message.author == bot.user:
+        # message_author_id is not always sent, so the slots may have been taken anyway
+        translation_user_limiter.release(payload.user_id)
+        translation_global_limiter.release()
         return
 
     # Fetch the message content
@@ -327,7 +1581,7 @@ async def on_reaction_add(reaction, user):
 
     # Optionally, remove the user's reaction to keep the channel clean
     try:
-        await reaction.remove(user)
+        await message.remove_reaction(payload.emoji, user)
     except discord.Forbidden:
         # If the bot lacks permissions to remove reactions
         pass
@@ -355,6 +1609,7 @@ async def list_languages(ctx):
 
 
 def encode_data(data):
+    # Signing stays on the stdlib json: orjson's compact output would change the signature
     secret = SECRET
     sorted_keys = sorted(data.keys())
     encoded_data = "&".join(
@@ -375,34 +1630,13 @@ async def fetch_player_info(session, player_id):
         "origin": wos_giftcode_url,
     }
     async with session.post(wos_player_info_url, data=data, headers=headers) as response:
-        return await response.json()
-
-
-
-# Helper function for color assignment based on alliance
-def get_alliance_color(alliance):
-    color_mapping = {
-        "SBZ": discord.Color.yellow(),
-        "PVP": discord.Color.orange(),
-        "SIN": discord.Color.red(),
-        "WPA": discord.Color.green(),
-        "Wrk": discord.Color.pink(),
-        "WTF": discord.Color.blue(),
-        "JaA": discord.Color.magenta(),
-        "CHL": discord.Color.purple(),
-        "T": discord.Color.light_grey(),
-        "None": discord.Color.greyple(),
-    }
-    return color_mapping.get(alliance.upper().strip(), discord.Color.greyple())
+        return await response.json(loads=json_loads)
+
+
 
-def create_profile_embed(ctx, member, fid, nickname, alliance, rank, furnace_display, avatar_url, color):
+def create_profile_embed(fid, nickname, alliance, rank, furnace_display, avatar_url, color):
     """Creates and returns an embed for the given member's profile with improved formatting."""
 
-    # Add alliance prefix to the nickname, based on ROLE_PREFIXES dictionary
-    alliance_prefix = next(
-        (prefix.replace("[", "").replace("]", "") for role_id, prefix in ROLE_PREFIXES.items() if member.get_role(role_id)),
-        ""
-    )
     full_nickname = f"**{nickname}**"
 
     embed = discord.Embed(
@@ -450,34 +1684,133 @@ def create_profile_embed(ctx, member, fid, nickname, alliance, rank, furnace_dis
     embed.set_footer(text="WOS State #1454", icon_url="attachment://game_logo.png")
 
     # Return embed and the game logo file for attachment
-    return embed, discord.File("game_logo.png", filename="game_logo.png")
+    return embed, game_logo_file()
+
+# Profile Rendering Pipeline
+game_logo_bytes = None
+
+def game_logo_file():
+    """Returns the game logo as an attachment, reading it from disk only once."""
+    global game_logo_bytes
+    if game_logo_bytes is None:
+        with open(GAME_LOGO_FILE, 'rb') as f:
+            game_logo_bytes = f.read()
+    return discord.File(io.BytesIO(game_logo_bytes), filename=GAME_LOGO_FILE)
+
+def compute_furnace_display(furnace_lv):
+    display = str(furnace_lv)
+    for lowest_level, band in FURNACE_BANDS:
+        if furnace_lv >= lowest_level:
+            display = band
+    return display
+
+FURNACE_DISPLAY = tuple(compute_furnace_display(furnace_lv) for furnace_lv in range(FURNACE_TABLE_SIZE))
+
+def format_furnace_level(furnace_lv):
+    """Returns the furnace level as shown on profiles, banding 35+ into "FC-" levels."""
+    if 0 <= furnace_lv < FURNACE_TABLE_SIZE:
+        return FURNACE_DISPLAY[furnace_lv]
+    return compute_furnace_display(furnace_lv)
+
+def resolve_member_roles(member, config):
+    """Returns (primary_prefix, secondary_prefix, alliance, rank, color) for a member's roles."""
+    if member is None:
+        return "", "", "None", "Member", discord.Color.greyple()
+    primary = next((role for role in config.primary_roles if member.get_role(role[0])), None)
+    secondary = next((role for role in config.secondary_roles if member.get_role(role[0])), None)
+    if primary:
+        primary_prefix, alliance, color = primary[1], primary[2], primary[3]
+    else:
+        primary_prefix, alliance, color = "", "None", discord.Color.greyple()
+    secondary_prefix, rank = (secondary[1], secondary[2]) if secondary else ("", "Member")
+    return primary_prefix, secondary_prefix, alliance, rank, color
+
+class ProfileCache:
+    """Short-lived cache of rendered profile embeds."""
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.embeds = OrderedDict()  # key -> (rendered_at, embed)
+
+    def get(self, key):
+        cached = self.embeds.get(key)
+        if cached is None or time.monotonic() - cached[0] >= self.ttl:
+            return None
+        self.embeds.move_to_end(key)
+        return cached[1]
+
+    def put(self, key, embed):
+        if self.ttl <= 0:
+            return
+        self.embeds[key] = (time.monotonic(), embed)
+        self.embeds.move_to_end(key)
+        while len(self.embeds) > self.max_size:
+            self.embeds.popitem(last=False)
+
+    def invalidate(self, guild_id=None):
+        """Drops every rendered embed, or only those of one guild (keys start with the guild ID)."""
+        if guild_id is None:
+            self.embeds.clear()
+        else:
+            for key in [key for key in self.embeds if key[0] == guild_id]:
+                del self.embeds[key]
+
+profile_cache = ProfileCache(PROFILE_CACHE_TTL, PROFILE_CACHE_SIZE)
 
-def claim_giftcode_rewards_wos(player_id, giftcode):
-    """Handles the gift code redemption request for Whiteout Survival."""
+def render_profile(ctx, member, fid, player_info):
+    """Builds the profile embed and logo attachment for a player and their Discord member."""
+    config = get_guild_config(ctx.guild)
+    in_game_nickname = player_info.get("nickname", "Unknown")
+    furnace_lv = player_info.get("stove_lv", 0)
+    avatar_url = player_info.get("avatar_image")
+
+    primary_prefix, secondary_prefix, alliance, rank, color = resolve_member_roles(member, config)
+
+    # Clean the in-game nickname and rebuild it with the member's prefixes
+    full_nickname = f"{primary_prefix}{secondary_prefix}{clean_nickname(in_game_nickname, config)}"
+
+    return create_profile_embed(
+        fid,
+        full_nickname,
+        alliance,
+        rank,
+        format_furnace_level(furnace_lv),
+        avatar_url,
+        color
+    )
+
+async def fetch_profile_info(fid):
+    """Fetches a player's in-game data. Returns None if the game API has no data for them."""
+    async with aiohttp.ClientSession() as session:
+        player_data = await fetch_player_info(session, fid)
+    if not player_data or "data" not in player_data:
+        return None
+    return player_data["data"]
+
+def create_wos_session():
+    """Creates a requests session with the retry policy used for the gift code API."""
     session = requests.Session()
     session.mount("https://", HTTPAdapter(max_retries=retry_config))
+    return session
 
-    headers = {
-        "accept": "application/json, text/plain, */*",
-        "content-type": "application/x-www-form-urlencoded",
-        "origin": wos_giftcode_url,
-    }
-
-    # First, fetch player info to establish the session
+def login_player_wos(session, player_id):
+    """Fetches player info to establish the session. Returns True when the login succeeded."""
     data_to_encode = {
         "fid": f"{player_id}",
         "time": f"{int(datetime.now().timestamp())}",
     }
     data = encode_data(data_to_encode)
 
-    response_player_info = session.post(wos_player_info_url, headers=headers, data=data)
-    player_info_json = response_player_info.json()
+    response_player_info = session.post(wos_player_info_url, headers=wos_headers, data=data)
+    player_info_json = json_loads(response_player_info.content)
 
     if player_info_json.get("msg") != "success":
         print(f"Error fetching player info for {player_id}: {player_info_json.get('msg')}")
-        return "NOT_LOGIN_FAILED"
+        return False
+    return True
 
-    # Now, proceed to redeem the gift code using the same session
+def redeem_giftcode_wos(session, player_id, giftcode):
+    """Redeems a single gift code on an already logged-in session and returns its status."""
     data_to_encode = {
         "fid": f"{player_id}",
         "cdk": giftcode,
@@ -485,10 +1818,9 @@ def claim_giftcode_rewards_wos(player_id, giftcode):
     }
     data = encode_data(data_to_encode)
 
-    response_giftcode = session.post(wos_giftcode_url, headers=headers, data=data)
-    response_json = response_giftcode.json()
+    response_giftcode = session.post(wos_giftcode_url, headers=wos_headers, data=data)
+    response_json = json_loads(response_giftcode.content)
 
-    # Process the response as before
     if response_json.get("msg") == "SUCCESS":
         return "SUCCESS"
     elif response_json.get("msg") == "RECEIVED." and response_json.get("err_code") == 40008:
@@ -500,299 +1832,569 @@ def claim_giftcode_rewards_wos(player_id, giftcode):
         return "NOT_LOGIN_FAILED"
     else:
         error_msg = response_json.get("msg", "Unknown error")
-        print(f"Error redeeming gift code for {player_id}: {error_msg}")
+        print(f"Error redeeming gift code {giftcode} for {player_id}: {error_msg}")
         return "ERROR"
 
-@bot.command(name='user')
-async def user_info(ctx, *, search_term: str):
-    try:
-        fid = int(search_term)
-        search_by = "id"
-    except ValueError:
-        fid = None
-        search_by = "nickname"
+def claim_giftcodes_rewards_wos(player_id, giftcodes):
+    """
+    Redeems several gift codes for one player over a single logged-in session.
+
+    :param player_id: The in-game ID (fid) of the player.
+    :param giftcodes: The gift codes to redeem, in order.
+    :return: A dict mapping each gift code to its redemption status.
+    """
+    session = create_wos_session()
 
+    # Log in once, then reuse the session for every code
+    if not login_player_wos(session, player_id):
+        return {giftcode: "NOT_LOGIN_FAILED" for giftcode in giftcodes}
+
+    results = {}
+    for giftcode in giftcodes:
+        try:
+            results[giftcode] = redeem_giftcode_wos(session, player_id, giftcode)
+        except Exception as e:
+            print(f"Exception redeeming {giftcode} for {player_id}: {e}")
+            results[giftcode] = "ERROR"
+    return results
+
+def record_giftcode_result(fid, giftcode, status):
+    """
+    Persists the outcome of a single (fid, giftcode) redemption.
+
+    Successful redemptions are written to the history, and every pair keeps
+    one latest outcome in giftcode_outcomes. Once a player has the rewards
+    (SUCCESS or ALREADY_RECEIVED) later results no longer change it. Transient
+    failures are (re)scheduled in the retry queue with exponential backoff and
+    any final outcome removes the pair from the queue. The per-code statistics
+    are updated in the same transaction.
+    """
+    now = datetime.now().isoformat()
     with Database() as db:
-        if search_by == "id":
-            db.execute("SELECT fid, nickname, discord_id FROM users WHERE fid=?", (fid,))
+        if status == "SUCCESS":
+            db.execute(
+                "INSERT OR IGNORE INTO gift_code_history (fid, giftcode, redeemed_at) VALUES (?, ?, ?)",
+                (fid, giftcode, now)
+            )
+
+        db.execute("SELECT status FROM giftcode_outcomes WHERE fid=? AND giftcode=?", (fid, giftcode))
+        row = db.fetchone()
+        previous = row[0] if row else None
+        if previous in REDEEMED_STATUSES:
+            # e.g. ALREADY_RECEIVED after the bot's own SUCCESS
+            current = previous
         else:
-            db.execute("SELECT fid, nickname, discord_id FROM users WHERE nickname=?", (search_term,))
-        user = db.fetchone()
+            current = status
+            db.execute("""
+                INSERT INTO giftcode_outcomes (fid, giftcode, status, redeemed_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(fid, giftcode) DO UPDATE SET
+                    status=excluded.status,
+                    redeemed_at=excluded.redeemed_at,
+                    updated_at=excluded.updated_at
+            """, (fid, giftcode, status, now if status in REDEEMED_STATUSES else None, now))
+
+        db.execute("SELECT attempts FROM giftcode_retry_queue WHERE fid=? AND giftcode=?", (fid, giftcode))
+        row = db.fetchone()
+        was_queued = row is not None
+        attempts = (row[0] if row else 0) + 1
 
-    if user is None:
-        await ctx.send(f"No user found with {search_by} '{search_term}'.")
-        return
+        if current in RETRYABLE_STATUSES and attempts <= RETRY_MAX_ATTEMPTS:
+            delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+            db.execute("""
+                INSERT INTO giftcode_retry_queue (fid, giftcode, attempts, last_status, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(fid, giftcode) DO UPDATE SET
+                    attempts=excluded.attempts,
+                    last_status=excluded.last_status,
+                    next_attempt_at=excluded.next_attempt_at
+            """, (fid, giftcode, attempts, status, time.time() + delay))
+            pending_delta = 0 if was_queued else 1
+        else:
+            if status in RETRYABLE_STATUSES:
+                logging.warning(f"Giving up on gift code {giftcode} for {fid} after {RETRY_MAX_ATTEMPTS} attempts.")
+            db.execute("DELETE FROM giftcode_retry_queue WHERE fid=? AND giftcode=?", (fid, giftcode))
+            pending_delta = -1 if was_queued else 0
 
-    fid, nickname, discord_id = user
+        db.execute("SELECT COALESCE((SELECT guild_id FROM users WHERE fid=?), 0)", (fid,))
+        guild_key = db.fetchone()[0]
+        update_giftcode_stats(db, guild_key, giftcode, previous, current, pending_delta, now)
+    giftcode_stats_cache.invalidate(giftcode)
 
-    # Fetch in-game data
-    async with aiohttp.ClientSession() as session:
-        player_data = await fetch_player_info(session, fid)
+def update_giftcode_stats(db, guild_key, giftcode, previous, current, pending_delta, now):
+    """
+    Incrementally applies one outcome change to a guild's giftcode_stats row:
+    the player moves from the previous outcome's column to the current one.
+    """
+    deltas = {}
+    if current != previous:
+        if previous is not None:
+            column = GIFTCODE_STAT_COLUMNS.get(previous, "error_count")
+            deltas[column] = deltas.get(column, 0) - 1
+        column = GIFTCODE_STAT_COLUMNS.get(current, "error_count")
+        deltas[column] = deltas.get(column, 0) + 1
+    newly_redeemed = current in REDEEMED_STATUSES and previous not in REDEEMED_STATUSES
+    redeemed_at = now if newly_redeemed else None
+
+    columns = list(deltas)
+    inserts = "".join(f", {column}" for column in columns)
+    values = "".join(", MAX(?, 0)" for _ in columns)
+    updates = "".join(f"{column}=MAX({column} + ?, 0),\n            " for column in columns)
+    db.execute(f"""
+        INSERT INTO giftcode_stats (guild_id, giftcode{inserts}, pending_count, first_redeemed_at, last_redeemed_at, updated_at)
+        VALUES (?, ?{values}, MAX(?, 0), ?, ?, ?)
+        ON CONFLICT(guild_id, giftcode) DO UPDATE SET
+            {updates}pending_count=MAX(pending_count + ?, 0),
+            first_redeemed_at=COALESCE(first_redeemed_at, excluded.first_redeemed_at),
+            last_redeemed_at=COALESCE(excluded.last_redeemed_at, last_redeemed_at),
+            updated_at=excluded.updated_at
+    """, (guild_key, giftcode, *deltas.values(), pending_delta, redeemed_at, redeemed_at, now, *deltas.values(), pending_delta))
+
+class GiftcodeStatsCache:
+    """
+    In-memory copy of giftcode_stats for read-heavy consumers such as the HTTP
+    API. Invalidated rows are reloaded lazily on the next read.
+    """
+    columns = ('guild_id', 'giftcode', 'success_count', 'already_received_count', 'similar_code_count', 'login_failed_count',
+               'error_count', 'pending_count', 'first_redeemed_at', 'last_redeemed_at', 'updated_at')
+    count_columns = columns[2:8]
+
+    def __init__(self):
+        self.rows = None  # (guild_id, giftcode) -> dict, None until first loaded
+        self.stale = set()
+        self.version = 0
+
+    def invalidate(self, giftcode=None):
+        if giftcode is None:
+            self.rows = None
+        else:
+            self.stale.add(giftcode)
+        self.version += 1
 
-    if not player_data or "data" not in player_data:
-        await ctx.send(f"Could not retrieve data for user ID '{fid}' from the game API.")
+    def all(self):
+        if self.rows is not None and not self.stale:
+            return self.rows
+        query = f"SELECT {', '.join(self.columns)} FROM giftcode_stats"
+        with Database() as db:
+            if self.rows is None:
+                db.execute(query)
+                self.rows = {}
+            else:
+                stale = list(self.stale)
+                db.execute(f"{query} WHERE giftcode IN ({', '.join('?' for _ in stale)})", stale)
+            for row in db.fetchall():
+                self.rows[(row[0], row[1])] = dict(zip(self.columns, row))
+        self.stale.clear()
+        return self.rows
+
+    def for_guild(self, guild_id):
+        """Returns {giftcode: stats} summed over the guild's players and unscoped legacy players."""
+        stats = {}
+        for (guild_key, giftcode), row in self.all().items():
+            if guild_key not in (0, guild_id):
+                continue
+            total = stats.get(giftcode)
+            if total is None:
+                stats[giftcode] = {column: row[column] for column in self.columns[1:]}
+                continue
+            for column in self.count_columns:
+                total[column] += row[column]
+            total['first_redeemed_at'] = min(filter(None, (total['first_redeemed_at'], row['first_redeemed_at'])), default=None)
+            total['last_redeemed_at'] = max(filter(None, (total['last_redeemed_at'], row['last_redeemed_at'])), default=None)
+            total['updated_at'] = max(filter(None, (total['updated_at'], row['updated_at'])), default=None)
+        return stats
+
+giftcode_stats_cache = GiftcodeStatsCache()
+
+# Redemption Job Tracking
+class RedemptionJob:
+    """Live progress of one /giftredeem run or retry queue drain."""
+    __slots__ = ('id', 'kind', 'guild_id', 'giftcodes', 'total', 'processed', 'results', 'started_at', 'finished_at')
+
+    def __init__(self, job_id, kind, guild_id, giftcodes, total):
+        self.id = job_id
+        self.kind = kind
+        self.guild_id = guild_id
+        self.giftcodes = list(giftcodes)
+        self.total = total
+        self.processed = 0
+        self.results = {giftcode: Counter() for giftcode in self.giftcodes}
+        self.started_at = datetime.now().isoformat()
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'guild_id': str(self.guild_id) if self.guild_id is not None else None,
+            'state': 'finished' if self.finished_at else 'running',
+            'giftcodes': self.giftcodes,
+            'total': self.total,
+            'processed': self.processed,
+            'results': {giftcode: dict(counts) for giftcode, counts in self.results.items()},
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+class RedemptionJobs:
+    """Registry of running and recently finished redemption jobs."""
+    def __init__(self, keep=API_JOB_HISTORY):
+        self.jobs = OrderedDict()
+        self.keep = keep
+        self.next_id = 1
+        self.version = 0
+
+    def start(self, kind, guild_id, giftcodes, total):
+        job = RedemptionJob(self.next_id, kind, guild_id, giftcodes, total)
+        self.jobs[job.id] = job
+        self.next_id += 1
+        finished = [job_id for job_id, other in self.jobs.items() if other.finished_at]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self.jobs[job_id]
+        self.version += 1
+        return job
+
+    def advance(self, job, code_statuses):
+        """Records one processed player's {giftcode: status} results."""
+        job.processed += 1
+        for giftcode, status in code_statuses.items():
+            job.results.setdefault(giftcode, Counter())[status] += 1
+        self.version += 1
+
+    def finish(self, job):
+        job.finished_at = datetime.now().isoformat()
+        self.version += 1
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+redemption_jobs = RedemptionJobs()
+
+# Serializes retry drains and /giftredeem runs so no (fid, giftcode) pair is redeemed
+# and recorded twice concurrently
+redemption_lock = asyncio.Lock()
+
+async def drain_retry_queue(force=False, max_players=RETRY_PLAYERS_PER_DRAIN):
+    """
+    Retries queued (fid, giftcode) pairs that are due.
+
+    Pairs are grouped by player so each player is logged in once per drain.
+
+    :param force: Ignore the backoff schedule and retry everything queued.
+    :param max_players: Maximum number of players to process in this drain.
+    :return: A dict mapping each status to the number of pairs that ended with it.
+    """
+    if redemption_lock.locked() and not force:
+        # A /giftredeem or another drain is running; the next scheduled drain picks the rows up
+        return {}
+    async with redemption_lock:
+        with Database() as db:
+            if force:
+                db.execute("SELECT fid, giftcode FROM giftcode_retry_queue ORDER BY next_attempt_at")
+            else:
+                db.execute(
+                    "SELECT fid, giftcode FROM giftcode_retry_queue WHERE next_attempt_at <= ? ORDER BY next_attempt_at",
+                    (time.time(),)
+                )
+            rows = db.fetchall()
+
+        pending = {}
+        for fid, giftcode in rows:
+            if fid not in pending and len(pending) >= max_players:
+                continue
+            pending.setdefault(fid, []).append(giftcode)
+
+        summary = {}
+        if not pending:
+            return summary
+        job = redemption_jobs.start('retry', None, dict.fromkeys(giftcode for codes in pending.values() for giftcode in codes), len(pending))
+        try:
+            for fid, giftcodes in pending.items():
+                try:
+                    # Run the blocking requests call off the event loop
+                    code_statuses = await asyncio.to_thread(claim_giftcodes_rewards_wos, fid, giftcodes)
+                except Exception as e:
+                    logging.error(f"Exception while retrying gift codes for {fid}: {e}")
+                    code_statuses = {giftcode: "ERROR" for giftcode in giftcodes}
+
+                for giftcode, status in code_statuses.items():
+                    record_giftcode_result(fid, giftcode, status)
+                    summary[status] = summary.get(status, 0) + 1
+                redemption_jobs.advance(job, code_statuses)
+                await asyncio.sleep(RETRY_PLAYER_DELAY)
+        finally:
+            redemption_jobs.finish(job)
+
+        if summary:
+            logging.info(f"Retry queue drain finished: {summary}")
+        return summary
+
+@tasks.loop(minutes=RETRY_DRAIN_INTERVAL)
+async def retry_queue_task():
+    await drain_retry_queue()
+
+@retry_queue_task.before_loop
+async def before_retry_queue_task():
+    await bot.wait_until_ready()
+
+@bot.command(name='giftretry')
+@commands.has_permissions(administrator=True)  # Restricts command to administrators
+async def gift_retry(ctx):
+    """
+    Admin command to immediately retry every queued failed gift code redemption.
+
+    Usage:
+    /giftretry
+    """
+    with Database() as db:
+        db.execute("SELECT COUNT(*) FROM giftcode_retry_queue")
+        queued = db.fetchone()[0]
+
+    if not queued:
+        await ctx.send("✅ The retry queue is empty.")
         return
 
-    player_info = player_data["data"]
-    in_game_nickname = player_info.get("nickname", "Unknown")
-    furnace_lv = player_info.get("stove_lv", 0)
-    avatar_url = player_info.get("avatar_image")  # Ensure the correct key is used
+    if redemption_lock.locked():
+        await ctx.send("A gift code redemption is running; the retry starts as soon as it finishes.")
+    await ctx.send(f"Retrying {queued} queued gift code redemption(s)...")
+    summary = await drain_retry_queue(force=True, max_players=queued)
+
+    embed = discord.Embed(title="Gift Code Retry Results", color=discord.Color.blue())
+    for status, count in summary.items():
+        embed.add_field(name=status, value=str(count), inline=True)
 
-    # Update nickname and furnace level in the database
     with Database() as db:
-        db.execute("UPDATE users SET nickname=?, furnace_lv=? WHERE fid=?", (in_game_nickname, furnace_lv, fid))
-        db.execute("SELECT discord_id FROM users WHERE fid=?", (fid,))
-        row = db.fetchone()
-        discord_id = row[0] if row else None
+        db.execute("SELECT COUNT(*) FROM giftcode_retry_queue")
+        remaining = db.fetchone()[0]
+    embed.set_footer(text=f"{remaining} redemption(s) still queued for retry.")
+    await ctx.send(embed=embed)
 
-    # Attempt to get the Discord member using the linked discord_id
-    target_member = ctx.guild.get_member(discord_id) if discord_id else None
-
-    # Determine alliance and rank from roles if member is found
-    if target_member:
-        # Fetch primary prefix based on the member's roles
-        primary_prefix = next(
-            (prefix for role_id, prefix in ROLE_PREFIXES.items() if target_member.get_role(role_id)),
-            ""
-        )
-        # Fetch secondary prefix based on the member's roles
-        secondary_prefix = next(
-            (prefix for role_id, prefix in SECONDARY_PREFIXES.items() if target_member.get_role(role_id)),
-            ""
+class UserSelectView(discord.ui.View):
+    """Selection menu shown when a /user nickname search has several matches."""
+    def __init__(self, ctx, matches):
+        super().__init__(timeout=60)
+        self.ctx = ctx
+        self.select = discord.ui.Select(
+            placeholder="Select a player",
+            options=[
+                discord.SelectOption(label=nickname[:100] or str(fid), description=f"ID: {fid}", value=str(fid))
+                for fid, nickname in matches[:25]
+            ]
         )
-        alliance = primary_prefix.strip("[] ") if primary_prefix else "None"
-        rank = secondary_prefix.strip("[] ") if secondary_prefix else "Member"
-        color = get_alliance_color(alliance)
-    else:
-        alliance = "None"
-        rank = "Member"
-        color = discord.Color.greyple()
-        primary_prefix = ""
-        secondary_prefix = ""
-
-    # Clean the in-game nickname to remove any existing prefixes
-    cleaned_nickname = clean_nickname(in_game_nickname)
-
-    # Construct full nickname with prefixes
-    full_nickname = f"{primary_prefix}{secondary_prefix}{cleaned_nickname}"
-
-    # Handle Furnace Level Display with "FC-"
-    if 35 <= furnace_lv <= 39:
-        furnace_display = "FC-1"
-    elif 40 <= furnace_lv <= 44:
-        furnace_display = "FC-2"
-    elif furnace_lv >= 45:
-        furnace_display = "FC-3"
-    else:
-        furnace_display = str(furnace_lv)
-
-    # Create the embed with in-game and Discord information
-    embed, file = create_profile_embed(
-        ctx,
-        target_member,
-        fid,
-        full_nickname,
-        alliance,
-        rank,
-        furnace_display,
-        avatar_url,
-        color
-    )
+        self.select.callback = self.on_select
+        self.add_item(self.select)
 
-    # Send the embed along with the game logo file
-    await ctx.send(embed=embed, file=file)
+    async def interaction_check(self, interaction):
+        if interaction.user.id == self.ctx.author.id:
+            return True
+        await interaction.response.send_message("Only the person who ran the search can pick a result.", ephemeral=True)
+        return False
 
+    async def on_select(self, interaction):
+        await interaction.response.edit_message(content="Loading profile...", view=None)
+        self.stop()
+        await send_user_profile(self.ctx, int(self.select.values[0]))
 
-# Remove User Command
-@bot.command(name='removeuser')
-async def remove_user(ctx, fid: int):
-    with Database() as db:
-        db.execute("DELETE FROM users WHERE fid=?", (fid,))
-    await ctx.send(f"User with ID {fid} has been removed from the database.")
+@bot.command(name='user')
+@commands.guild_only()
+async def user_info(ctx, *, search_term: str):
+    try:
+        fid = int(search_term)
+        search_by = "id"
+    except ValueError:
+        fid = None
+        search_by = "nickname"
 
-@bot.command(name='profile')
-async def show_profile(ctx, fid: int = None):
-    # If no fid is provided, try to get it from the linked Discord account
-    if fid is None:
-        discord_id = ctx.author.id
-        with Database() as db:
-            db.execute("SELECT fid FROM users WHERE discord_id=?", (discord_id,))
-            result = db.fetchone()
-        if result:
-            fid = result[0]
-        else:
-            await ctx.send("You haven't linked your account yet. Use `/link [in-game ID]` to link your account.")
+    guild_id = ctx.guild.id
+    if search_by == "id":
+        if roster.get(fid, guild_id) is None:
+            await ctx.send(f"No user found with {search_by} '{search_term}'.")
             return
+        await send_user_profile(ctx, fid)
+        return
 
-    # Fetch in-game data from the game API
-    async with aiohttp.ClientSession() as session:
-        player_data = await fetch_player_info(session, fid)
+    # Ranked prefix/fuzzy lookup through the in-memory nickname index
+    matches = roster.search(search_term, guild_id)
+    if not matches:
+        await ctx.send(f"No user found with {search_by} '{search_term}'.")
+        return
 
-    if not player_data or "data" not in player_data:
-        await ctx.send(f"Could not retrieve data for user ID '{fid}' from the game API.")
+    exact = [match for match in matches if NicknameIndex.normalize(match[1]) == NicknameIndex.normalize(search_term)]
+    if len(matches) == 1 or len(exact) == 1:
+        await send_user_profile(ctx, (exact or matches)[0][0])
         return
 
-    player_info = player_data["data"]
-    in_game_nickname = player_info.get("nickname", "Unknown")
-    furnace_lv = player_info.get("stove_lv", 0)
-    avatar_url = player_info.get("avatar_image")  # Use the correct key
+    await ctx.send(
+        f"Found {len(matches)} players matching '{search_term}'. Please select one:",
+        view=UserSelectView(ctx, matches)
+    )
+
+async def send_user_profile(ctx, fid):
+    """Refreshes a user's in-game data and sends their profile embed."""
+    guild_id = ctx.guild.id
+    entry = roster.get(fid, guild_id)
+    if entry is None:
+        await ctx.send(f"No user found with ID {fid}.")
+        return
+    discord_id = entry.discord_id
+    cache_key = (guild_id, fid, discord_id)
+
+    # Recently rendered profiles are reused without another API round-trip
+    embed = profile_cache.get(cache_key)
+    if embed is not None:
+        await ctx.send(embed=embed, file=game_logo_file())
+        return
+
+    # Fetch in-game data
+    player_info = await fetch_profile_info(fid)
+    if player_info is None:
+        await ctx.send(f"Could not retrieve data for user ID '{fid}' from the game API.")
+        return
 
     # Update nickname and furnace level in the database
-    with Database() as db:
-        db.execute("UPDATE users SET nickname=?, furnace_lv=? WHERE fid=?", (in_game_nickname, furnace_lv, fid))
-        db.execute("SELECT discord_id FROM users WHERE fid=?", (fid,))
-        row = db.fetchone()
-        discord_id = row[0] if row else None
+    roster.update_profile(fid, player_info.get("nickname", "Unknown"), player_info.get("stove_lv", 0))
 
     # Attempt to get the Discord member using the linked discord_id
-    target_member = ctx.guild.get_member(discord_id) if discord_id else None
-
-    # Determine alliance and rank from roles if member is found
-    if target_member:
-        # Fetch primary prefix based on the member's roles
-        primary_prefix = next(
-            (prefix for role_id, prefix in ROLE_PREFIXES.items() if discord.utils.get(target_member.roles, id=role_id)),
-            ""
-        )
-        # Fetch secondary prefix based on the member's roles
-        secondary_prefix = next(
-            (prefix for role_id, prefix in SECONDARY_PREFIXES.items() if discord.utils.get(target_member.roles, id=role_id)),
-            ""
-        )
-        color = get_alliance_color(primary_prefix.strip("[] "))
-    else:
-        primary_prefix = ""
-        secondary_prefix = ""
-        color = discord.Color.greyple()
-
-    # Clean the in-game nickname to remove any existing prefixes
-    cleaned_nickname = clean_nickname(in_game_nickname)
-
-    # Construct full nickname with prefixes
-    full_nickname = f"{primary_prefix}{secondary_prefix}{cleaned_nickname}"
-
-    # Handle Furnace Level Display with "FC-"
-    if 35 <= furnace_lv <= 39:
-        furnace_display = "FC-1"
-    elif 40 <= furnace_lv <= 44:
-        furnace_display = "FC-2"
-    elif furnace_lv >= 45:
-        furnace_display = "FC-3"
-    else:
-        furnace_display = str(furnace_lv)
+    target_member = await get_member(ctx.guild, discord_id)
 
     # Create the embed with in-game and Discord information
-    embed, file = create_profile_embed(
-        ctx,
-        target_member,
-        fid,
-        full_nickname,
-        primary_prefix.strip("[] ") or "None",
-        secondary_prefix.strip("[] ") or "Member",
-        furnace_display,
-        avatar_url,
-        color
-    )
+    embed, file = render_profile(ctx, target_member, fid, player_info)
+    profile_cache.put(cache_key, embed)
 
     # Send the embed along with the game logo file
     await ctx.send(embed=embed, file=file)
 
-@bot.command(name='giftredeem')
-async def use_giftcode(ctx, giftcode: str):
-    await ctx.message.delete()
-    notify_message = await ctx.send(
-        content="Alliance list is being checked for Gift Code usage. The process will be completed in approximately 10 minutes."
-    )
-
-    # Fetch all users from the database
-    with Database() as db:
-        db.execute("SELECT fid, nickname, furnace_lv FROM users")
-        users = db.fetchall()
-
-    # Initialize result lists
-    success_results = []
-    received_results = []
-    error_results = []
-    similar_code_results = []
-    login_errors = []  # Track 'NOT LOGIN' errors
-
-    for user in users:
-        fid, nickname, furnace_lv = user
-        try:
-            # Call the claim_giftcode_rewards_wos function and capture the response status
-            response_status = claim_giftcode_rewards_wos(player_id=fid, giftcode=giftcode)
+# Remove User Command
+@bot.command(name='removeuser')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)  # Restricts command to administrators
+async def remove_user(ctx, fid: int):
+    if roster.get(fid, ctx.guild.id) is None:
+        await ctx.send(f"No user found with ID {fid}.")
+        return
+    roster.remove(fid)
+    await ctx.send(f"User with ID {fid} has been removed from the database.")
 
-            # Process the response based on its status
-            if response_status == "SUCCESS":
-                with Database() as db:
-                    db.execute(
-                        "INSERT OR IGNORE INTO gift_code_history (fid, giftcode, redeemed_at) VALUES (?, ?, ?)",
-                        (fid, giftcode, datetime.now().isoformat())
-)
-                success_results.append(nickname)
-            elif response_status == "ALREADY_RECEIVED":
-                received_results.append(nickname)
-            elif response_status == "ALREADY_REDEEMED_SIMILAR_CODE":
-                similar_code_results.append(nickname)
-            elif response_status == "NOT_LOGIN_FAILED":
-                login_errors.append(nickname)
-            else:
-                error_results.append(nickname)
-        except Exception as e:
-            print(f"Exception for {fid} - {nickname}: {e}")
-            error_results.append(nickname)
+@bot.command(name='profile')
+@commands.guild_only()
+async def show_profile(ctx, fid: int = None):
+    # If no fid is provided, try to get it from the linked Discord account
+    if fid is None:
+        entry = roster.get_by_discord_id(ctx.author.id, ctx.guild.id)
+        if entry:
+            fid = entry.fid
+        else:
+            await ctx.send("You haven't linked your account yet. Use `/link [in-game ID]` to link your account.")
+            return
 
-    # Delete the notification message
-    await notify_message.delete()
+    await send_user_profile(ctx, fid)
 
-    # Send summaries for each result category as separate embeds
-    if success_results:
+async def send_giftcode_results(ctx, giftcode, results):
+    """Sends the summary embeds for one gift code's redemption results."""
+    if results["SUCCESS"]:
         success_embed = discord.Embed(
             title=f"{giftcode} Gift Code - Successfully Redeemed",
-            description=", ".join(success_results),
+            description=", ".join(results["SUCCESS"]),
             color=discord.Color.green()
         )
         success_embed.set_footer(text="These users have successfully redeemed the gift code.")
         await ctx.send(embed=success_embed)
 
-    if received_results:
+    if results["ALREADY_RECEIVED"]:
         received_embed = discord.Embed(
             title=f"{giftcode} Gift Code - Already Redeemed",
-            description=", ".join(received_results),
+            description=", ".join(results["ALREADY_RECEIVED"]),
             color=discord.Color.orange()
         )
         received_embed.set_footer(text="These users have already redeemed this gift code.")
         await ctx.send(embed=received_embed)
 
-    if similar_code_results:
+    if results["ALREADY_REDEEMED_SIMILAR_CODE"]:
         similar_embed = discord.Embed(
             title=f"{giftcode} Gift Code - Already Redeemed Similar Code",
-            description=", ".join(similar_code_results),
+            description=", ".join(results["ALREADY_REDEEMED_SIMILAR_CODE"]),
             color=discord.Color.yellow()
         )
         similar_embed.set_footer(text="These users have already redeemed a similar type of code.")
         await ctx.send(embed=similar_embed)
 
-    if login_errors:
+    if results["NOT_LOGIN_FAILED"]:
         login_embed = discord.Embed(
             title=f"{giftcode} Gift Code - Login Required",
-            description=", ".join(login_errors),
+            description=", ".join(results["NOT_LOGIN_FAILED"]),
             color=discord.Color.red()
         )
-        login_embed.set_footer(text="These users encountered a login issue during gift code redemption.")
+        login_embed.set_footer(text="These users encountered a login issue and were queued for retry.")
         await ctx.send(embed=login_embed)
 
-    if error_results:
+    if results["ERROR"]:
         error_embed = discord.Embed(
             title=f"{giftcode} Gift Code - Errors",
-            description=", ".join(error_results),
+            description=", ".join(results["ERROR"]),
             color=discord.Color.red()
         )
-        error_embed.set_footer(text="Errors occurred for these users during gift code redemption.")
+        error_embed.set_footer(text="Errors occurred for these users and they were queued for retry.")
         await ctx.send(embed=error_embed)
 
+@bot.command(name='giftredeem')
+@commands.guild_only()
+async def use_giftcode(ctx, *giftcodes: str):
+    """
+    Redeems one or more gift codes for every user in the alliance list.
+
+    Usage:
+    /giftredeem CODE1 [CODE2 ...]
+    """
+    # Drop duplicates while keeping the order the codes were given in
+    giftcodes = list(dict.fromkeys(code.strip() for code in giftcodes if code.strip()))
+    if not giftcodes:
+        await ctx.send("Please provide at least one gift code. Usage: `/giftredeem CODE1 [CODE2 ...]`")
+        return
+
+    await ctx.message.delete()
+    notify_message = await ctx.send(
+        content="Alliance list is being checked for Gift Code usage. The process will be completed in approximately 10 minutes."
+    )
+
+    # Fetch all users from the roster
+    users = [(entry.fid, entry.nickname, entry.furnace_lv) for entry in roster.members(ctx.guild.id)]
+
+    # Initialize result lists per gift code
+    statuses = ["SUCCESS", "ALREADY_RECEIVED", "ALREADY_REDEEMED_SIMILAR_CODE", "NOT_LOGIN_FAILED", "ERROR"]
+    results = {giftcode: {status: [] for status in statuses} for giftcode in giftcodes}
+
+    # One redemption run at a time; a queued run waits for the current one to finish
+    async with redemption_lock:
+        # Progress is visible on the HTTP API's /jobs endpoint while this runs
+        job = redemption_jobs.start('giftredeem', ctx.guild.id, giftcodes, len(users))
+        try:
+            for user in users:
+                fid, nickname, furnace_lv = user
+                try:
+                    # Log the player in once and redeem every code on the same session, off the event loop
+                    code_statuses = await asyncio.to_thread(claim_giftcodes_rewards_wos, fid, giftcodes)
+                except Exception as e:
+                    print(f"Exception for {fid} - {nickname}: {e}")
+                    code_statuses = {giftcode: "ERROR" for giftcode in giftcodes}
+
+                for giftcode, response_status in code_statuses.items():
+                    # Record history and queue transient failures for retry
+                    record_giftcode_result(fid, giftcode, response_status)
+                    results[giftcode].get(response_status, results[giftcode]["ERROR"]).append(nickname)
+                redemption_jobs.advance(job, code_statuses)
+        finally:
+            redemption_jobs.finish(job)
+
+    # Delete the notification message
+    await notify_message.delete()
+
+    # Send summaries for each gift code and result category as separate embeds
+    for giftcode in giftcodes:
+        await send_giftcode_results(ctx, giftcode, results[giftcode])
+
 
 @bot.command(name='useradd')
+@commands.guild_only()
 async def add_user(ctx, ids: str):
     added = []
     already_exists = []
@@ -809,13 +2411,10 @@ async def add_user(ctx, ids: str):
             player_info = response['data']
             nickname = player_info.get('nickname', 'Unknown')
             furnace_lv = player_info.get('stove_lv', 0)
-            with Database() as db:
-                db.execute("SELECT * FROM users WHERE fid=?", (fid,))
-                if db.fetchone() is None:
-                    db.execute("INSERT INTO users (fid, nickname, furnace_lv) VALUES (?, ?, ?)", (fid, nickname, furnace_lv))
-                    added.append(nickname)
-                else:
-                    already_exists.append(nickname)
+            if roster.add(fid, nickname, furnace_lv, ctx.guild.id):
+                added.append(nickname)
+            else:
+                already_exists.append(nickname)
 
     #Embed for useradd
     embed = discord.Embed(title="User Addition Results")
@@ -824,8 +2423,12 @@ async def add_user(ctx, ids: str):
     await ctx.send(embed=embed)
 
 @bot.command(name='link')
+@commands.guild_only()
 async def link_account(ctx, fid: int):
     discord_id = ctx.author.id
+    if roster.is_foreign(fid, ctx.guild.id):
+        await ctx.send(f"In-game ID {fid} belongs to another server's roster.")
+        return
     async with aiohttp.ClientSession() as session:
         player_data = await fetch_player_info(session, fid)
     if not player_data or "data" not in player_data:
@@ -836,19 +2439,12 @@ async def link_account(ctx, fid: int):
     nickname = player_info.get("nickname", "Unknown")
     furnace_lv = player_info.get("stove_lv", 0)
 
-    with Database() as db:
-        db.execute("SELECT * FROM users WHERE fid=?", (fid,))
-        user = db.fetchone()
-        if user:
-            # Update the discord_id and nickname in case they have changed
-            db.execute("UPDATE users SET discord_id=?, nickname=?, furnace_lv=? WHERE fid=?", (discord_id, nickname, furnace_lv, fid))
-            await ctx.send(f"Successfully linked your Discord account to in-game ID {fid}.")
-        else:
-            # Insert new user
-            db.execute("INSERT INTO users (fid, nickname, furnace_lv, discord_id) VALUES (?, ?, ?, ?)", (fid, nickname, furnace_lv, discord_id))
-            await ctx.send(f"Successfully linked your Discord account to in-game ID {fid}.")
+    # Insert the user, or update the discord_id and nickname in case they have changed
+    roster.link(fid, discord_id, nickname, furnace_lv, ctx.guild.id)
+    await ctx.send(f"Successfully linked your Discord account to in-game ID {fid}.")
 
 @bot.command(name='adminlink')
+@commands.guild_only()
 @commands.has_permissions(administrator=True)  # Restricts command to administrators
 async def admin_link(ctx, member: discord.Member, fid: int):
     """
@@ -860,103 +2456,54 @@ async def admin_link(ctx, member: discord.Member, fid: int):
     # Log the command usage
     logging.info(f"Admin {ctx.author} is attempting to link {member} to fid {fid}.")
 
-    # Fetch in-game data
-    async with aiohttp.ClientSession() as session:
-        player_data = await fetch_player_info(session, fid)
+    if roster.is_foreign(fid, ctx.guild.id):
+        await ctx.send(f"❌ The in-game ID `{fid}` belongs to another server's roster.")
+        return
 
-    # Validate player data
-    if not player_data or "data" not in player_data:
+    # Fetch and validate in-game data
+    player_info = await fetch_profile_info(fid)
+    if player_info is None:
         await ctx.send(f"❌ Could not retrieve data for user ID `{fid}` from the game API.")
         logging.error(f"Failed to fetch data for fid {fid}.")
         return
 
-    player_info = player_data["data"]
     in_game_nickname = player_info.get("nickname", "Unknown")
     furnace_lv = player_info.get("stove_lv", 0)
-    avatar_url = player_info.get("avatar_image")  # Ensure this key is correct
 
     # Check if the fid is already linked to another Discord user
-    with Database() as db:
-        db.execute("SELECT discord_id FROM users WHERE fid=?", (fid,))
-        existing_link = db.fetchone()
-        if existing_link:
-            existing_discord_id = existing_link[0]
-            if existing_discord_id is not None and existing_discord_id != member.id:
-                existing_member = bot.get_user(existing_discord_id)
-                if existing_member:
-                    existing_member_mention = existing_member.mention
-                else:
-                    existing_member_mention = 'another user'
-                await ctx.send(f"❌ The in-game ID `{fid}` is already linked to {existing_member_mention}.")
-                logging.warning(f"Attempt to link fid {fid} to {member} but it's already linked to {existing_discord_id}.")
-                return
-
-        # Check if the Discord member is already linked to another fid
-        db.execute("SELECT fid FROM users WHERE discord_id=?", (member.id,))
-        existing_fid = db.fetchone()
-        if existing_fid:
-            existing_fid = existing_fid[0]
-            await ctx.send(f"❌ {member.mention} is already linked to in-game ID `{existing_fid}`.")
-            logging.warning(f"Attempt to link {member} to fid {fid}, but they are already linked to fid {existing_fid}.")
+    existing_link = roster.get(fid)
+    if existing_link:
+        existing_discord_id = existing_link.discord_id
+        if existing_discord_id is not None and existing_discord_id != member.id:
+            existing_member = bot.get_user(existing_discord_id)
+            if existing_member:
+                existing_member_mention = existing_member.mention
+            else:
+                existing_member_mention = 'another user'
+            await ctx.send(f"❌ The in-game ID `{fid}` is already linked to {existing_member_mention}.")
+            logging.warning(f"Attempt to link fid {fid} to {member} but it's already linked to {existing_discord_id}.")
             return
 
-        # Proceed to link the member
-        try:
-            db.execute("""
-                INSERT INTO users (fid, nickname, furnace_lv, discord_id)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(fid) DO UPDATE SET
-                    nickname=excluded.nickname,
-                    furnace_lv=excluded.furnace_lv,
-                    discord_id=excluded.discord_id
-            """, (fid, in_game_nickname, furnace_lv, member.id))
-            logging.info(f"Linked {member} to fid {fid} successfully.")
-        except sqlite3.IntegrityError as e:
-            await ctx.send(f"❌ Database error: {e}")
-            logging.error(f"Database error while linking: {e}")
-            return
+    # Check if the Discord member is already linked to another fid
+    existing_entry = roster.get_by_discord_id(member.id)
+    if existing_entry:
+        existing_fid = existing_entry.fid
+        await ctx.send(f"❌ {member.mention} is already linked to in-game ID `{existing_fid}`.")
+        logging.warning(f"Attempt to link {member} to fid {fid}, but they are already linked to fid {existing_fid}.")
+        return
 
-    # Determine alliance and rank based on roles
-    primary_prefix = next(
-        (prefix for role_id, prefix in ROLE_PREFIXES.items() if member.get_role(role_id)),
-        ""
-    )
-    secondary_prefix = next(
-        (prefix for role_id, prefix in SECONDARY_PREFIXES.items() if member.get_role(role_id)),
-        ""
-    )
-    alliance = primary_prefix.strip("[] ") if primary_prefix else "None"
-    rank = secondary_prefix.strip("[] ") if secondary_prefix else "Member"
-    color = get_alliance_color(alliance)
-
-    # Clean the in-game nickname to remove any existing prefixes
-    cleaned_nickname = clean_nickname(in_game_nickname)
-
-    # Construct full nickname with prefixes
-    full_nickname = f"{primary_prefix}{secondary_prefix}{cleaned_nickname}"
-
-    # Handle Furnace Level Display with "FC-"
-    if 35 <= furnace_lv <= 39:
-        furnace_display = "FC-1"
-    elif 40 <= furnace_lv <= 44:
-        furnace_display = "FC-2"
-    elif furnace_lv >= 45:
-        furnace_display = "FC-3"
-    else:
-        furnace_display = str(furnace_lv)
+    # Proceed to link the member
+    try:
+        roster.link(fid, member.id, in_game_nickname, furnace_lv, ctx.guild.id)
+        logging.info(f"Linked {member} to fid {fid} successfully.")
+    except sqlite3.IntegrityError as e:
+        await ctx.send(f"❌ Database error: {e}")
+        logging.error(f"Database error while linking: {e}")
+        return
 
     # Create the embed with in-game and Discord information
-    embed, file = create_profile_embed(
-        ctx,
-        member,
-        fid,
-        full_nickname,
-        alliance,
-        rank,
-        furnace_display,
-        avatar_url,
-        color
-    )
+    embed, file = render_profile(ctx, member, fid, player_info)
+    profile_cache.put((ctx.guild.id, fid, member.id), embed)
 
     # Send the embed along with the game logo file
     await ctx.send(embed=embed, file=file)
@@ -968,6 +2515,7 @@ async def admin_link(ctx, member: discord.Member, fid: int):
         logging.warning(f"Could not send DM to {member}. They might have DMs disabled.")
 
 @bot.command(name='adminunlink')
+@commands.guild_only()
 @commands.has_permissions(administrator=True)  # Restricts command to administrators
 async def admin_unlink(ctx, member: discord.Member):
     """
@@ -979,30 +2527,27 @@ async def admin_unlink(ctx, member: discord.Member):
     # Log the command usage
     logging.info(f"Admin {ctx.author} is attempting to unlink {member} from their fid.")
 
-    # Check if the member is linked in the database
-    with Database() as db:
-        db.execute("SELECT fid FROM users WHERE discord_id=?", (member.id,))
-        user = db.fetchone()
+    # Check if the member is linked in this guild's roster
+    user = roster.get_by_discord_id(member.id, ctx.guild.id)
 
     if not user:
         await ctx.send(f"❌ {member.mention} is not linked to any in-game ID.")
         logging.warning(f"Attempt to unlink {member} who is not linked to any fid.")
         return
 
-    fid = user[0]
+    fid = user.fid
 
     # Remove the link from the database
     try:
-        with Database() as db:
-            db.execute("DELETE FROM users WHERE fid=?", (fid,))
-            logging.info(f"Unlinked {member} from fid {fid}.")
+        roster.remove(fid)
+        logging.info(f"Unlinked {member} from fid {fid}.")
     except sqlite3.Error as e:
         await ctx.send(f"❌ Database error: {e}")
         logging.error(f"Database error while unlinking: {e}")
         return
 
     # Optionally, reset the member's nickname to remove prefixes
-    base_nickname = clean_nickname(member.nick or member.name)
+    base_nickname = clean_nickname(member.nick or member.name, get_guild_config(ctx.guild))
     try:
         await member.edit(nick=base_nickname)
         logging.info(f"Reset nickname for {member} to {base_nickname}.")
@@ -1025,13 +2570,12 @@ async def admin_unlink(ctx, member: discord.Member):
         logging.warning(f"Could not send DM to {member}. They might have DMs disabled.")
 
 @bot.command(name='viewlist')
+@commands.guild_only()
 async def show_users(ctx):
-    with Database() as db:
-        db.execute("SELECT fid, nickname, furnace_lv FROM users ORDER BY nickname ASC")
-        users = db.fetchall()
+    users = [(entry.fid, entry.nickname, entry.furnace_lv) for entry in roster.members(ctx.guild.id)]
     
     user_count = len(users)
-    embed_title = f"{ALLIANCE_NAME} Members ({user_count})"
+    embed_title = f"{get_guild_config(ctx.guild).alliance_name} Members ({user_count})"
     user_info, part_number = "", 1
 
     for user in users:
@@ -1046,7 +2590,11 @@ async def show_users(ctx):
         await ctx.send(embed=discord.Embed(title=embed_title if part_number == 1 else f"{embed_title} (Part {part_number})", description=user_info, color=discord.Color.blue()))
 
 @bot.command(name='giftcodehistory')
+@commands.guild_only()
 async def gift_code_history(ctx, fid: int):
+    if roster.get(fid, ctx.guild.id) is None:
+        await ctx.send(f"No user found with ID {fid}.")
+        return
     with Database() as db:
         db.execute("SELECT giftcode, redeemed_at FROM gift_code_history WHERE fid=?", (fid,))
         history = db.fetchall()
@@ -1059,6 +2607,885 @@ async def gift_code_history(ctx, fid: int):
     await ctx.send(embed=embed)
 
 
+@bot.command(name='giftcodestats')
+@commands.guild_only()
+async def giftcode_stats(ctx, giftcode: str = None):
+    """
+    Shows this server's redemption statistics for a gift code, or the most recent
+    codes if none is given. Each player is counted once, by their latest outcome.
+
+    Usage:
+    /giftcodestats [giftcode]
+    """
+    columns = (
+        "giftcode, SUM(success_count), SUM(already_received_count), SUM(similar_code_count), SUM(login_failed_count), "
+        "SUM(error_count), SUM(pending_count), MIN(first_redeemed_at), MAX(last_redeemed_at)"
+    )
+    # This guild's players plus unscoped legacy players (guild_id 0)
+    with Database() as db:
+        if giftcode:
+            db.execute(
+                f"SELECT {columns} FROM giftcode_stats WHERE guild_id IN (0, ?) AND giftcode=? GROUP BY giftcode",
+                (ctx.guild.id, giftcode)
+            )
+        else:
+            db.execute(
+                f"SELECT {columns} FROM giftcode_stats WHERE guild_id IN (0, ?) GROUP BY giftcode ORDER BY MAX(updated_at) DESC LIMIT 10",
+                (ctx.guild.id,)
+            )
+        rows = db.fetchall()
+
+    if not rows:
+        await ctx.send(f"No statistics recorded for gift code '{giftcode}'." if giftcode else "No gift code statistics recorded yet.")
+        return
+
+    embed = discord.Embed(
+        title=f"{giftcode} Gift Code - Statistics" if giftcode else "Recent Gift Code Statistics",
+        color=discord.Color.blue()
+    )
+    for code, success, received, similar, login_failed, errors, pending, first_at, last_at in rows:
+        value = (
+            f"✅ Redeemed: `{success}` | 🟠 Already had it: `{received}` | 🟡 Similar: `{similar}`\n"
+            f"🔐 Login failed: `{login_failed}` | ❌ Errors: `{errors}` | ⏳ Pending: `{pending}`"
+        )
+        if first_at:
+            value += f"\nFirst: `{first_at[:19]}` | Last: `{last_at[:19]}`"
+        embed.add_field(name=code, value=value, inline=False)
+    embed.set_footer(text="Players counted once, by their latest outcome.")
+    await ctx.send(embed=embed)
+
+@bot.command(name='giftpending')
+@commands.guild_only()
+async def giftcode_pending(ctx, giftcode: str):
+    """
+    Lists the users who have not redeemed the given gift code yet. Players the
+    game reported as having already received it count as redeemed.
+
+    Usage:
+    /giftpending giftcode
+    """
+    with Database() as db:
+        # Served by idx_history_giftcode and idx_outcomes_giftcode, so this stays fast as history grows
+        db.execute(f"""
+            SELECT fid FROM gift_code_history WHERE giftcode=?
+            UNION
+            SELECT fid FROM giftcode_outcomes WHERE giftcode=? AND status IN ({', '.join('?' for _ in REDEEMED_STATUSES)})
+        """, (giftcode, giftcode, *REDEEMED_STATUSES))
+        redeemed = {row[0] for row in db.fetchall()}
+    users = [(entry.fid, entry.nickname) for entry in roster.members(ctx.guild.id) if entry.fid not in redeemed]
+
+    embed_title = f"{giftcode} Gift Code - Not Redeemed ({len(users)})"
+    if not users:
+        await ctx.send(embed=discord.Embed(title=embed_title, description="Everyone has redeemed this gift code.", color=discord.Color.green()))
+        return
+
+    user_info, part_number = "", 1
+    for fid, nickname in users:
+        line = f"**{nickname}** | ID: {fid}\n"
+        if len(user_info) + len(line) > 2000:
+            await ctx.send(embed=discord.Embed(title=embed_title if part_number == 1 else f"{embed_title} (Part {part_number})", description=user_info, color=discord.Color.orange()))
+            user_info, part_number = "", part_number + 1
+        user_info += line
+
+    if user_info:
+        await ctx.send(embed=discord.Embed(title=embed_title if part_number == 1 else f"{embed_title} (Part {part_number})", description=user_info, color=discord.Color.orange()))
+
+
+# Furnace Level Growth
+@tasks.loop(seconds=FURNACE_HISTORY_FLUSH_INTERVAL)
+async def furnace_history_task():
+    flush_furnace_history()
+
+@tasks.loop(hours=24)
+async def furnace_history_compact_task():
+    try:
+        removed = await asyncio.to_thread(FurnaceHistory.compact)
+        if removed:
+            logging.info(f"Furnace history compaction removed {removed} row(s).")
+    except sqlite3.Error as e:
+        logging.error(f"Furnace history compaction failed: {e}")
+
+def format_growth(start_lv, end_lv):
+    growth = end_lv - start_lv
+    return f"{format_furnace_level(start_lv)} → {format_furnace_level(end_lv)} ({'+' if growth >= 0 else ''}{growth})"
+
+async def resolve_alliance_entries(guild, config, tag):
+    """
+    Returns the roster entries of linked members holding the primary role for an
+    alliance tag. Membership starts from the guild's linked roster entries, so it
+    does not depend on role.members and the partial LOW_MEMORY_MEMBERS cache.
+    """
+    role_ids = [role_id for role_id, _, role_tag, _ in config.primary_roles if role_tag.casefold() == tag.casefold()]
+    if not role_ids:
+        return []
+    linked = {entry.discord_id: entry for entry in roster.members(guild.id) if entry.discord_id is not None}
+    if LOW_MEMORY_MEMBERS:
+        # The member cache is partial, so stream the full list from the API page by page
+        members = [member async for member in guild.fetch_members(limit=None) if member.id in linked]
+    else:
+        members = [guild.get_member(discord_id) for discord_id in linked]
+    return [
+        linked[member.id] for member in members
+        if member is not None and any(member.get_role(role_id) for role_id in role_ids)
+    ]
+
+@bot.command(name='growth')
+@commands.guild_only()
+async def show_growth(ctx, target: str, days: int = GROWTH_DEFAULT_DAYS):
+    """
+    Shows furnace level progression over the last N days for a player or an alliance.
+
+    Usage:
+    /growth fid|@member|alliance [days]
+    """
+    if days <= 0:
+        await ctx.send("❌ The number of days must be positive.")
+        return
+    since = int(time.time()) - days * 86400
+
+    # Include changes still waiting in the write buffer
+    flush_furnace_history()
+
+    if ctx.message.mentions or target.isdigit():
+        if ctx.message.mentions:
+            entry = roster.get_by_discord_id(ctx.message.mentions[0].id, ctx.guild.id)
+        else:
+            entry = roster.get(target, ctx.guild.id)
+        if entry is None:
+            await ctx.send("No user found with that ID or Discord account.")
+            return
+
+        start_levels, changes = await asyncio.gather(
+            asyncio.to_thread(FurnaceHistory.levels_since, [entry.fid], since),
+            asyncio.to_thread(FurnaceHistory.changes_since, entry.fid, since),
+        )
+        start_lv = start_levels.get(entry.fid, entry.furnace_lv)
+        embed = discord.Embed(
+            title=f"{entry.nickname} - Growth over {days} day(s)",
+            description=f"Furnace: {format_growth(start_lv, entry.furnace_lv)}",
+            color=discord.Color.blue()
+        )
+        timeline = [
+            f"`{datetime.fromtimestamp(observed_at).strftime('%Y-%m-%d')}` {format_furnace_level(furnace_lv)}"
+            for observed_at, furnace_lv, _ in changes
+        ]
+        if timeline:
+            embed.add_field(name=f"Changes ({len(timeline)})", value="\n".join(timeline[-GROWTH_TOP_PLAYERS:]), inline=False)
+        await ctx.send(embed=embed)
+        return
+
+    config = get_guild_config(ctx.guild)
+    entries = await resolve_alliance_entries(ctx.guild, config, target)
+    if not entries:
+        await ctx.send(f"No linked members found for alliance '{target}'.")
+        return
+
+    start_levels = await asyncio.to_thread(FurnaceHistory.levels_since, [entry.fid for entry in entries], since)
+    growth = sorted(
+        ((entry.furnace_lv - start_levels.get(entry.fid, entry.furnace_lv), entry) for entry in entries),
+        key=lambda item: item[0],
+        reverse=True
+    )
+    total = sum(gained for gained, _ in growth)
+    lines = [
+        f"**{entry.nickname}** | {format_growth(entry.furnace_lv - gained, entry.furnace_lv)}"
+        for gained, entry in growth[:GROWTH_TOP_PLAYERS]
+    ]
+    embed = discord.Embed(
+        title=f"{target} - Growth over {days} day(s)",
+        description="\n".join(lines),
+        color=next((color for _, _, tag, color in config.primary_roles if tag.casefold() == target.casefold()), discord.Color.blue())
+    )
+    embed.set_footer(
+        text=f"{len(entries)} member(s) | {sum(1 for gained, _ in growth if gained > 0)} grew | "
+             f"{total} level(s) total | {total / len(entries):.1f} average"
+    )
+    await ctx.send(embed=embed)
+
+
+# Streaming Export/Import Helpers
+def iter_table_rows(table, columns, guild_id=None, fetch_size=EXPORT_FETCH_SIZE):
+    """
+    Yields rows from a table lazily using cursor iteration. With a guild_id,
+    only rows of players visible to that guild are returned.
+    """
+    query, params = f"SELECT {', '.join(columns)} FROM {table}", ()
+    if guild_id is not None:
+        scope = "guild_id IS NULL OR guild_id = ?"
+        query += f" WHERE {scope}" if 'guild_id' in columns else f" WHERE fid IN (SELECT fid FROM users WHERE {scope})"
+        params = (guild_id,)
+    conn = sqlite3.connect(DB_FILE)
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+def iter_export_lines(rows, columns, fmt):
+    """Serializes rows one line at a time as CSV or JSON Lines."""
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def write_export_file(key, fmt, guild_id=None):
+    """
+    Streams a table to a temporary file, gzipping it if it grows large.
+
+    :param key: The export key from EXPORT_TABLES (e.g. 'users', 'history').
+    :param fmt: The output format, 'csv' or 'jsonl'.
+    :param guild_id: Restricts the export to players visible to this guild.
+    :return: A tuple of (path, filename, row_count).
+    """
+    table, columns = EXPORT_TABLES[key]
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+    row_count = 0
+
+    def counted(rows):
+        nonlocal row_count
+        for row in rows:
+            row_count += 1
+            yield row
+
+    with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+        for line in iter_export_lines(counted(iter_table_rows(table, columns, guild_id)), columns, fmt):
+            f.write(line)
+
+    filename = f"{key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    if os.path.getsize(path) > EXPORT_GZIP_THRESHOLD:
+        gz_path = f"{path}.gz"
+        with open(path, 'rb') as src, gzip.open(gz_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(path)
+        path, filename = gz_path, f"{filename}.gz"
+    return path, filename, row_count
+
+def iter_import_rows(path, filename, columns):
+    """Yields row tuples lazily from a CSV or JSON Lines file, optionally gzipped."""
+    name = filename.lower()
+    opener = gzip.open if name.endswith('.gz') else open
+    name = name[:-3] if name.endswith('.gz') else name
+
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if name.endswith('.jsonl'):
+            records = (json.loads(line) for line in f if line.strip())
+        elif name.endswith('.csv'):
+            records = csv.DictReader(f)
+        else:
+            raise ValueError("Unsupported file type. Use .csv or .jsonl (optionally .gz).")
+
+        for record in records:
+            # Empty CSV cells map to NULL so optional columns like discord_id stay unset
+            yield tuple(record.get(column) if record.get(column) != '' else None for column in columns)
+
+def scope_import_rows(rows, columns, guild_id):
+    """Assigns imported users to the importing guild and drops other rows for players outside it."""
+    if 'guild_id' in columns:
+        index = columns.index('guild_id')
+        for row in rows:
+            yield row[:index] + (guild_id,) + row[index + 1:]
+    else:
+        for row in rows:
+            if roster.get(row[0], guild_id) is not None:
+                yield row
+
+def import_rows(table, columns, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Inserts rows in batched transactions, skipping rows that already exist.
+
+    :return: A tuple of (rows_read, rows_inserted).
+    """
+    query = f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    rows_read = rows_inserted = 0
+    batch = []
+
+    def flush():
+        with Database() as db:
+            db.executemany(query, batch)
+            return db.connection.total_changes
+
+    for row in rows:
+        batch.append(row)
+        rows_read += 1
+        if len(batch) >= batch_size:
+            rows_inserted += flush()
+            batch = []
+    if batch:
+        rows_inserted += flush()
+    return rows_read, rows_inserted
+
+@bot.command(name='exportdata')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)  # Restricts command to administrators
+async def export_data(ctx, table: str, fmt: str = 'csv'):
+    """
+    Admin command to export this server's roster, redemption history or furnace
+    level history as an attachment.
+
+    Usage:
+    /exportdata users|history|furnace [csv|jsonl]
+    """
+    table, fmt = table.lower(), fmt.lower()
+    if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+        await ctx.send(f"❌ Usage: `/exportdata {'|'.join(EXPORT_TABLES)} [{'|'.join(EXPORT_FORMATS)}]`")
+        return
+
+    # Stream the table to disk off the event loop
+    path, filename, row_count = await asyncio.to_thread(write_export_file, table, fmt, ctx.guild.id)
+    try:
+        await ctx.send(
+            f"✅ Exported {row_count} row(s) from `{table}`.",
+            file=discord.File(path, filename=filename)
+        )
+    except discord.HTTPException as e:
+        logging.error(f"Failed to upload export {filename}: {e}")
+        await ctx.send(f"❌ Failed to upload the export: {e}")
+    finally:
+        os.remove(path)
+
+@bot.command(name='importdata')
+@commands.guild_only()
+@commands.has_permissions(administrator=True)  # Restricts command to administrators
+async def import_data(ctx, table: str):
+    """
+    Admin command to import roster, redemption history or furnace level history from an attached file.
+    Accepts the files produced by /exportdata. Existing rows are left untouched,
+    imported users are assigned to this server and history for players outside
+    its roster is skipped.
+
+    Usage:
+    /importdata users|history|furnace  (with a .csv, .jsonl, .csv.gz or .jsonl.gz attachment)
+    """
+    table = table.lower()
+    if table not in EXPORT_TABLES or not ctx.message.attachments:
+        await ctx.send(f"❌ Usage: `/importdata {'|'.join(EXPORT_TABLES)}` with a CSV or JSONL file attached.")
+        return
+
+    attachment = ctx.message.attachments[0]
+    db_table, columns = EXPORT_TABLES[table]
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        await attachment.save(path)
+        rows = scope_import_rows(iter_import_rows(path, attachment.filename, columns), columns, ctx.guild.id)
+        rows_read, rows_inserted = await asyncio.to_thread(import_rows, db_table, columns, rows)
+        if db_table == 'gift_code_history' and rows_inserted:
+            await asyncio.to_thread(rebuild_giftcode_stats_now)
+            giftcode_stats_cache.invalidate()
+        elif db_table == 'users' and rows_inserted:
+            roster.load()
+    except (ValueError, csv.Error, sqlite3.Error, OSError) as e:
+        logging.error(f"Import of {attachment.filename} into {db_table} failed: {e}")
+        await ctx.send(f"❌ Import failed: {e}")
+        return
+    finally:
+        os.remove(path)
+
+    logging.info(f"Admin {ctx.author} imported {rows_inserted}/{rows_read} row(s) into {db_table}.")
+    await ctx.send(f"✅ Imported {rows_inserted} new row(s) into `{table}` ({rows_read} read, {rows_read - rows_inserted} skipped).")
+
+
+# Online Backups
+def create_backup(prefix='gift_db', protect=None):
+    """
+    Snapshots the live database with the SQLite online backup API, copying a few
+    pages per step, then gzips the snapshot into BACKUP_DIR and rotates old ones
+    with the same prefix. Runs on a worker thread.
+
+    :param prefix: The snapshot name prefix; each prefix keeps its own BACKUP_KEEP files.
+    :param protect: A backup file name that rotation must not remove.
+    :return: The path of the compressed snapshot.
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    # Microseconds keep a manual and a scheduled backup in the same second apart
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    snapshot_path = os.path.join(BACKUP_DIR, f"{prefix}_{stamp}.sqlite")
+    source = sqlite3.connect(DB_FILE)
+    target = sqlite3.connect(snapshot_path)
+    try:
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+    finally:
+        target.close()
+        source.close()
+
+    compressed_path = f"{snapshot_path}.gz"
+    with open(snapshot_path, 'rb') as src, gzip.open(compressed_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(snapshot_path)
+    rotate_backups(prefix, protect)
+    return compressed_path
+
+def list_backups(prefix=None):
+    """Returns backup file names, newest first, optionally only those with the given prefix."""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    names = [
+        name for name in os.listdir(BACKUP_DIR)
+        if name.endswith('.sqlite.gz') and (prefix is None or name.startswith(f"{prefix}_"))
+    ]
+    return sorted(names, key=lambda name: os.path.getmtime(os.path.join(BACKUP_DIR, name)), reverse=True)
+
+def rotate_backups(prefix='gift_db', protect=None):
+    for name in [name for name in list_backups(prefix) if name != protect][BACKUP_KEEP:]:
+        os.remove(os.path.join(BACKUP_DIR, name))
+
+def restore_backup(name):
+    """
+    Restores a compressed snapshot into the live database with the backup API.
+    The snapshot is integrity-checked first and the current database is backed
+    up before it is overwritten. Runs on a worker thread.
+    """
+    path = os.path.join(BACKUP_DIR, os.path.basename(name))
+    if not os.path.exists(path):
+        raise ValueError(f"Backup {name} does not exist.")
+
+    fd, snapshot_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    try:
+        with gzip.open(path, 'rb') as src, open(snapshot_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        source = sqlite3.connect(snapshot_path)
+        try:
+            result = source.execute("PRAGMA integrity_check").fetchone()[0]
+            if result != 'ok':
+                raise ValueError(f"Backup {name} failed the integrity check: {result}")
+            create_backup(prefix='pre_restore', protect=os.path.basename(name))
+            target = sqlite3.connect(DB_FILE)
+            try:
+                source.backup(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        os.remove(snapshot_path)
+
+@tasks.loop(hours=BACKUP_INTERVAL_HOURS)
+async def backup_task():
+    try:
+        path = await asyncio.to_thread(create_backup)
+        logging.info(f"Scheduled backup written to {path}.")
+    except (sqlite3.Error, OSError) as e:
+        logging.error(f"Scheduled backup failed: {e}")
+
+@bot.command(name='backupnow')
+@commands.has_permissions(administrator=True)  # Restricts command to administrators
+async def backup_now(ctx):
+    """Admin command to take a database backup immediately."""
+    try:
+        path = await asyncio.to_thread(create_backup)
+    except (sqlite3.Error, OSError) as e:
+        logging.error(f"Manual backup failed: {e}")
+        await ctx.send(f"❌ Backup failed: {e}")
+        return
+    await ctx.send(f"✅ Backup written to `{os.path.basename(path)}`.")
+
+@bot.command(name='backups')
+@commands.has_permissions(administrator=True)  # Restricts command to administrators
+async def show_backups(ctx):
+    """Admin command to list the available database backups."""
+    backups = list_backups()
+    if not backups:
+        await ctx.send("No backups have been taken yet.")
+        return
+    lines = [
+        f"`{name}` ({os.path.getsize(os.path.join(BACKUP_DIR, name)) / 1024:.0f} KiB)"
+        for name in backups
+    ]
+    await ctx.send(embed=discord.Embed(title="Database Backups", description="\n".join(lines), color=discord.Color.blue()))
+
+@bot.command(name='restorebackup')
+@commands.is_owner()
+async def restore_backup_command(ctx, name: str):
+    """
+    Owner command to restore the database from a backup. The current database
+    is backed up first.
+
+    Usage:
+    /restorebackup gift_db_YYYYMMDD_HHMMSS_ffffff.sqlite.gz
+    """
+    if redemption_lock.locked():
+        await ctx.send("A gift code redemption is running; the restore starts as soon as it finishes.")
+    await ctx.send(f"Restoring `{name}`...")
+    # No redemption may record results while the live file is overwritten
+    async with redemption_lock:
+        # Buffered furnace changes belong to the current database and go into its pre-restore backup
+        flush_furnace_history()
+        try:
+            await asyncio.to_thread(restore_backup, name)
+        except (ValueError, sqlite3.Error, OSError) as e:
+            logging.error(f"Restore of {name} failed: {e}")
+            await ctx.send(f"❌ Restore failed: {e}")
+            return
+
+        # Reload everything that caches database contents
+        initialize_db()
+        guild_configs.invalidate()
+        giftcode_stats_cache.invalidate()
+        roster.load()
+        # Changes observed while the restore ran describe the replaced database
+        furnace_history.pending.clear()
+    logging.info(f"Owner {ctx.author} restored the database from {name}.")
+    await ctx.send(f"✅ Database restored from `{name}`.")
+
+
+# Event Loop Lag Monitor
+class LoopLagMonitor:
+    """
+    Detects blocking calls on the event loop. A heartbeat task records when the
+    loop last ran; a watchdog thread notices when it stops running and logs the
+    loop thread's current stack, i.e. whatever is blocking it.
+    """
+    def __init__(self, interval=LOOP_LAG_INTERVAL, threshold=LOOP_LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.task = None
+
+    def start(self):
+        if self.task is not None:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.task = asyncio.create_task(self.heartbeat())
+        threading.Thread(target=self.watchdog, name="loop-lag-watchdog", daemon=True).start()
+
+    async def heartbeat(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.last_beat = time.monotonic()
+            lag = self.last_beat - started - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                logging.warning(f"Event loop lagged {lag:.3f}s behind schedule.")
+
+    def watchdog(self):
+        reported_beat = None
+        while True:
+            time.sleep(self.interval)
+            last_beat = self.last_beat
+            stalled = time.monotonic() - last_beat
+            if stalled <= self.threshold + self.interval or reported_beat == last_beat:
+                continue
+            # Report each stall once, while it is still happening
+            reported_beat = last_beat
+            self.stall_count += 1
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<stack unavailable>\n"
+            logging.warning(f"Event loop blocked for {stalled:.2f}s so far. Loop thread stack:\n{stack}")
+
+loop_lag_monitor = LoopLagMonitor()
+profile_lock = asyncio.Lock()
+
+def sample_thread_stacks(thread_id, seconds, interval=PROFILE_SAMPLE_INTERVAL):
+    """Samples a thread's stack for `seconds` and returns (samples, self_counts, inclusive_counts)."""
+    self_counts, inclusive_counts = Counter(), Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            samples += 1
+            self_counts[f"{frame.f_code.co_filename}:{frame.f_code.co_firstlineno}({frame.f_code.co_name})"] += 1
+            seen = set()
+            while frame is not None:
+                key = f"{frame.f_code.co_filename}:{frame.f_code.co_firstlineno}({frame.f_code.co_name})"
+                if key not in seen:
+                    seen.add(key)
+                    inclusive_counts[key] += 1
+                frame = frame.f_back
+        time.sleep(interval)
+    return samples, self_counts, inclusive_counts
+
+def format_sample_report(seconds, samples, self_counts, inclusive_counts):
+    lines = [f"Sampling profile of the event loop thread: {seconds}s, {samples} samples", ""]
+    for title, counts in (("Self time (leaf frames)", self_counts), ("Inclusive time (anywhere on stack)", inclusive_counts)):
+        lines.append(title)
+        for key, count in counts.most_common(PROFILE_TOP_FUNCTIONS):
+            lines.append(f"{count / max(samples, 1):7.1%}  {count:6d}  {key}")
+        lines.append("")
+    return "\n".join(lines)
+
+def format_cprofile_report(seconds, profiler):
+    output = io.StringIO()
+    output.write(f"cProfile of the event loop thread: {seconds}s\n\n")
+    stats = pstats.Stats(profiler, stream=output)
+    for sort_key in ('cumulative', 'tottime'):
+        output.write(f"Sorted by {sort_key}\n")
+        stats.sort_stats(sort_key).print_stats(PROFILE_TOP_FUNCTIONS)
+    return output.getvalue()
+
+@bot.command(name='perfprofile')
+@commands.is_owner()
+async def perf_profile(ctx, seconds: int = 10, mode: str = 'sample'):
+    """
+    Owner command to profile the event loop for N seconds and return the hot functions.
+
+    Usage:
+    /perfprofile [seconds] [sample|cprofile]
+    """
+    mode = mode.lower()
+    if mode not in ('sample', 'cprofile') or not 1 <= seconds <= PROFILE_MAX_SECONDS:
+        await ctx.send(f"❌ Usage: `/perfprofile [1-{PROFILE_MAX_SECONDS}] [sample|cprofile]`")
+        return
+    if profile_lock.locked():
+        await ctx.send("❌ A profiling session is already running.")
+        return
+
+    async with profile_lock:
+        await ctx.send(f"Profiling the event loop for {seconds}s ({mode})...")
+        if mode == 'cprofile':
+            # cProfile hooks the current thread, which is the event loop thread
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.disable()
+            report = format_cprofile_report(seconds, profiler)
+        else:
+            # Sample from a worker thread so the loop keeps running normally
+            samples, self_counts, inclusive_counts = await asyncio.to_thread(
+                sample_thread_stacks, threading.get_ident(), seconds
+            )
+            report = format_sample_report(seconds, samples, self_counts, inclusive_counts)
+
+    summary = (
+        f"✅ Profile complete. Max loop lag since start: `{loop_lag_monitor.max_lag:.3f}s`, "
+        f"stalls over {LOOP_LAG_THRESHOLD}s: `{loop_lag_monitor.stall_count}`."
+    )
+    filename = f"profile_{mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    await ctx.send(summary, file=discord.File(io.BytesIO(report.encode()), filename=filename))
+
+
+# Read-only HTTP API
+class ApiServer:
+    """
+    Optional read-only JSON API, started when API_PORT is set in settings.txt.
+    Every endpoint is served from in-memory state (roster, gift code stats
+    cache, redemption jobs) and carries an ETag, so pollers sending
+    If-None-Match get 304 Not Modified while nothing has changed.
+
+    When API_TOKEN is set, requests need an "Authorization: Bearer <token>"
+    header. It is mandatory when API_HOST is not a loopback address.
+
+    Endpoints:
+    GET /roster?guild_id=ID
+    GET /giftcodes?guild_id=ID
+    GET /giftcodes/{giftcode}?guild_id=ID
+    GET /jobs
+    GET /jobs/{id}
+    """
+    def __init__(self):
+        self.runner = None
+        self.public = False
+        self.responses = OrderedDict()  # cache key -> (version, body, etag)
+
+    @staticmethod
+    def is_loopback(host):
+        if host == 'localhost':
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+
+    @web.middleware
+    async def authenticate(self, request, handler):
+        if API_TOKEN or self.public:
+            expected = f"Bearer {API_TOKEN}".encode()
+            if not API_TOKEN or not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+                raise web.HTTPUnauthorized(text="A valid API token is required.")
+        return await handler(request)
+
+    def build_app(self):
+        app = web.Application(middlewares=[self.authenticate])
+        app.router.add_get('/roster', self.get_roster)
+        app.router.add_get('/giftcodes', self.get_giftcodes)
+        app.router.add_get('/giftcodes/{giftcode}', self.get_giftcode)
+        app.router.add_get('/jobs', self.get_jobs)
+        app.router.add_get('/jobs/{job_id}', self.get_job)
+        return app
+
+    async def start(self, host, port):
+        if self.runner is not None:
+            return
+        self.public = not self.is_loopback(host)
+        if self.public and not API_TOKEN:
+            raise ValueError(f"API_TOKEN must be set when API_HOST ({host}) is not a loopback address.")
+        runner = web.AppRunner(self.build_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        self.runner = runner
+        logging.info(f"HTTP API listening on http://{host}:{port}")
+
+    def respond(self, request, key, version, build):
+        """
+        Serves the JSON for `key`, rebuilding and re-serializing it only when
+        `version` changed since it was last built.
+        """
+        cached = self.responses.get(key)
+        if cached is None or cached[0] != version:
+            body = json.dumps(build(), ensure_ascii=False).encode()
+            cached = (version, body, f'"{hashlib.md5(body).hexdigest()}"')
+            self.responses[key] = cached
+            if len(self.responses) > API_RESPONSE_CACHE_SIZE:
+                self.responses.popitem(last=False)
+        self.responses.move_to_end(key)
+
+        _, body, etag = cached
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if_none_match = request.headers.get('If-None-Match', '')
+        # Weak validators compare equal to strong ones for GET revalidation
+        client_etags = {tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip() for tag in if_none_match.split(',')}
+        if etag in client_etags or '*' in client_etags:
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type='application/json', headers=headers)
+
+    async def get_roster(self, request):
+        guild_id = self.required_guild_id(request)
+
+        def build():
+            members = [
+                {
+                    'fid': entry.fid,
+                    'nickname': entry.nickname,
+                    'furnace_lv': entry.furnace_lv,
+                    'furnace': format_furnace_level(entry.furnace_lv or 0),
+                    'discord_id': str(entry.discord_id) if entry.discord_id is not None else None,
+                    'guild_id': str(entry.guild_id) if entry.guild_id is not None else None,
+                }
+                for entry in roster.members(guild_id)
+            ]
+            return {'count': len(members), 'members': members}
+
+        return self.respond(request, ('roster', guild_id), roster.version, build)
+
+    @staticmethod
+    def required_guild_id(request):
+        # Always scoped to one guild; unscoped reads would expose every guild's data
+        guild_id = request.query.get('guild_id', '')
+        if not guild_id.isdigit():
+            raise web.HTTPBadRequest(text="guild_id is required and must be numeric.")
+        return int(guild_id)
+
+    async def get_giftcodes(self, request):
+        guild_id = self.required_guild_id(request)
+
+        def build():
+            rows = sorted(giftcode_stats_cache.for_guild(guild_id).values(), key=lambda row: row['updated_at'] or '', reverse=True)
+            return {'count': len(rows), 'giftcodes': rows}
+
+        return self.respond(request, ('giftcodes', guild_id), giftcode_stats_cache.version, build)
+
+    async def get_giftcode(self, request):
+        guild_id = self.required_guild_id(request)
+        giftcode = request.match_info['giftcode']
+        stats = giftcode_stats_cache.for_guild(guild_id).get(giftcode)
+        if stats is None:
+            raise web.HTTPNotFound(text=f"No statistics recorded for gift code {giftcode}.")
+        return self.respond(request, ('giftcode', guild_id, giftcode), giftcode_stats_cache.version, lambda: stats)
+
+    async def get_jobs(self, request):
+        def build():
+            return {'jobs': [job.to_dict() for job in reversed(redemption_jobs.jobs.values())]}
+
+        return self.respond(request, ('jobs',), redemption_jobs.version, build)
+
+    async def get_job(self, request):
+        job_id = request.match_info['job_id']
+        job = redemption_jobs.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            raise web.HTTPNotFound(text=f"No job with ID {job_id}.")
+        return self.respond(request, ('job', job.id), redemption_jobs.version, job.to_dict)
+
+api_server = ApiServer()
+
+
+# Configuration Hot-Reload
+config_mtimes = {}
+
+def get_config_mtimes():
+    return {path: os.path.getmtime(path) for path in (SETTINGS_FILE, MAPPINGS_FILE) if os.path.exists(path)}
+
+def reload_config():
+    """
+    Re-parses settings and mappings, validates them and swaps them into the
+    running bot in one step. Raises ValueError/OSError and leaves the current
+    configuration untouched if anything is invalid.
+
+    :return: A list of restart-only settings that changed and were not applied.
+    """
+    mtimes = get_config_mtimes()
+    new_config = build_config(parse_settings(), load_mappings())
+
+    pending_restart = [key for key in RESTART_ONLY_SETTINGS if new_config[key] != globals()[key]]
+    for key in RESTART_ONLY_SETTINGS:
+        new_config.pop(key)
+
+    # No awaits between the update and the cache flush, so handlers never see a half-applied config
+    globals().update(new_config)
+    guild_configs.invalidate()
+    config_mtimes.update(mtimes)
+
+    # CONFIG_WATCH takes effect immediately by starting or stopping the file watcher
+    if CONFIG_WATCH and not config_watch_task.is_running():
+        config_watch_task.start()
+    elif not CONFIG_WATCH and config_watch_task.is_running():
+        config_watch_task.stop()
+    logging.info("Configuration reloaded.")
+    return pending_restart
+
+@tasks.loop(seconds=CONFIG_WATCH_INTERVAL)
+async def config_watch_task():
+    mtimes = get_config_mtimes()
+    if mtimes == config_mtimes:
+        return
+    try:
+        pending_restart = reload_config()
+    except (ValueError, OSError) as e:
+        # Remember the broken version so it isn't re-parsed every tick
+        config_mtimes.update(mtimes)
+        logging.error(f"Configuration change ignored, validation failed: {e}")
+        return
+    if pending_restart:
+        logging.warning(f"Changes to {', '.join(pending_restart)} require a restart.")
+
+@bot.command(name='reload')
+@commands.is_owner()
+async def reload(ctx):
+    """Reloads settings.txt and the mappings file without restarting the bot."""
+    try:
+        pending_restart = reload_config()
+    except (ValueError, OSError) as e:
+        logging.error(f"Reload failed: {e}")
+        await ctx.send(f"❌ Reload failed, the current configuration was kept: {e}")
+        return
+
+    message = "✅ Configuration reloaded."
+    if pending_restart:
+        message += f" Changes to {', '.join(pending_restart)} require a restart."
+    await ctx.send(message)
+
+
 @bot.command(name='sync')
 @commands.is_owner()  
 async def sync(ctx):
@@ -1068,7 +3495,27 @@ async def sync(ctx):
 @bot.event
 async def on_ready():
     await bot.tree.sync()
+    if not retry_queue_task.is_running():
+        retry_queue_task.start()
+    start_translation_workers()
+    loop_lag_monitor.start()
+    if not backup_task.is_running():
+        backup_task.start()
+    if not furnace_history_task.is_running():
+        furnace_history_task.start()
+    if not furnace_history_compact_task.is_running():
+        furnace_history_compact_task.start()
+    if API_PORT:
+        try:
+            await api_server.start(API_HOST, API_PORT)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not start the HTTP API on {API_HOST}:{API_PORT}: {e}")
+    if CONFIG_WATCH and not config_watch_task.is_running():
+        config_mtimes.update(get_config_mtimes())
+        config_watch_task.start()
     print(f"Bot is online as {bot.user} and commands are synced.")
 
 # Run the bot with the token
+if ACCELERATE and uvloop is not None and sys.platform != 'win32':
+    uvloop.install()
 bot.run(BOT_TOKEN)